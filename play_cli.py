@@ -0,0 +1,93 @@
+"""
+Headless entry point: play against the AI or watch AI games in the terminal.
+"""
+
+import argparse
+import multiprocessing as mp
+import warnings
+from utils.core import GameCore
+from utils.player import Player
+from utils.arena import make_players
+from utils.distributed import Coordinator, parse_hosts
+from utils.record import RecordWriter
+
+warnings.filterwarnings('ignore')
+
+
+def show_options(core, player_id, options):
+    """Print the rolled options of a manual player."""
+    game = core.game
+    soldiers = game.players[player_id].soldiers
+    for i, o in enumerate(options):
+        print(f'  {i + 1}) region {o[0] + 2} with {min(o[1] + 1, soldiers)} soldiers')
+    if not core.has_rerolled:
+        print('  r) reroll')
+
+
+def manual_turn(core, player_id):
+    """Read a manual player's choice from stdin."""
+    options = core.roll_dice_for_player(player_id)
+    show_options(core, player_id, options)
+    while True:
+        choice = input(f'{core.player_names[player_id]} > ').strip().lower()
+        if choice == 'r' and core.reroll_dice_for_player(player_id):
+            show_options(core, player_id, core.current_options)
+        elif choice in ('1', '2', '3'):
+            core.take_manual_action(player_id, int(choice) - 1)
+            return
+
+
+def main():
+    """Main entry point for the terminal version."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_player', type=int, default=3)
+    parser.add_argument('--stage', type=int, default=0)
+    parser.add_argument('--model', type=str, default='best')
+    parser.add_argument('--human', type=str, default='', help='comma separated seats played from the terminal')
+    parser.add_argument('--search_time', type=float, default=2.0)
+    parser.add_argument('--judge', type=str, default='playout', choices=['playout', 'network', 'refine'],
+                        help='network is a quick uncalibrated estimate')
+    parser.add_argument('--dice', type=str, default='independent', choices=['independent', 'common', 'stratified'])
+    parser.add_argument('--adaptive_time', action='store_true')
+    parser.add_argument('--processes', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=str, default=None, help='comma separated host:port of search workers')
+    parser.add_argument('--record', type=str, default=None, help='append the game to this record file')
+    parser.add_argument('--cache', type=str, default=None, help='evaluation cache file shared between games')
+    args = parser.parse_args()
+
+    mp.set_start_method('spawn', force=True)
+    human = [int(s) for s in args.human.split(',') if s != '']
+    which_ai = [i for i in range(args.n_player) if i not in human]
+    names = [f'Player {i + 1}' + (' (AI)' if i in which_ai else '') for i in range(args.n_player)]
+    players, model_name = make_players(args.model, args.stage, args.n_player, which_ai)
+    judge_player = None if which_ai else Player('agent', players[0].model_config, args.n_player, 0, model_path=model_name)
+    core = GameCore()
+    core.on('action_taken', lambda p, region, soldiers, dice: print(
+        f'{names[p]} deploys {soldiers} to region {core.game.values[region]}'))
+    core.on('winrate_updated', lambda winrates, n: print(
+        '  win rates : ' + ', '.join(f'{w:.3f}' for w in winrates) + (f' ({n} playouts)' if n else '')))
+    core.on('game_ended', lambda scores: print('Final scores : ' + ', '.join(
+        f'{names[i]} {int(s)}' for i, s in enumerate(scores))))
+    core.initialize_game(players, names, which_ai, 1, search_time=args.search_time, judge_mode=args.judge,
+                         dice_sampling=args.dice, seed=args.seed, adaptive_time=args.adaptive_time,
+                         processes=args.processes, judge_player=judge_player, cache=args.cache)
+    if args.workers is not None:
+        core.searcher.remote = Coordinator(parse_hosts(args.workers))
+    if args.record is not None:
+        core.recorder = RecordWriter(args.record)
+
+    while core.step_turn():
+        player_id = core.get_current_player()
+        if core.is_ai_player(player_id):
+            core.take_ai_action(player_id)
+        else:
+            manual_turn(core, player_id)
+    if core.recorder is not None:
+        core.recorder.close()
+    if core.searcher.book is not None:
+        print(core.searcher.book.report())
+
+
+if __name__ == '__main__':
+    main()
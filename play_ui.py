@@ -3,6 +3,7 @@ Entry point for the UI version of the game simulator.
 """
 
 import sys
+import threading
 import multiprocessing as mp
 from PyQt6.QtWidgets import QApplication
 from ui.main_window import MainWindow
@@ -10,6 +11,10 @@ import warnings
 
 warnings.filterwarnings('ignore')
 
+def preload():
+    """Import the heavy modules in the background while the setup dialog is open."""
+    import utils.player
+
 def main():
     """Main entry point for UI application."""
     # Set multiprocessing start method
@@ -19,6 +24,9 @@ def main():
     app = QApplication(sys.argv)
     app.setApplicationName("天下鸣动 Game Simulator")
     
+    # Load torch while the user fills in the setup dialog
+    threading.Thread(target=preload, daemon=True).start()
+    
     # Create and show main window
     window = MainWindow()
     window.show()
@@ -183,17 +183,25 @@ class ActionPanel(QWidget):
         # Win Rate and Searches removed - now shown in WinRatePanel
         pass
     
-    def log_action(self, message, player_id=None):
-        """Add message to action log with player color."""
+    def format_message(self, message, player_id=None):
+        """HTML of a log message in the player's color."""
         if player_id is not None and (player_id + 1) < len(PLAYER_COLORS):
             color = PLAYER_COLORS[player_id + 1]  # Colors are indexed starting at 1
             # Format message with HTML color and bold, with spacing
-            colored_message = f'<span style="color: rgb({color[0]}, {color[1]}, {color[2]}); font-weight: bold;">{message}</span><br>'
-            self.log_text.append(colored_message)
-        else:
-            # Add bold and spacing for non-colored messages
-            bold_message = f'<span style="font-weight: bold;">{message}</span><br>'
-            self.log_text.append(bold_message)
+            return f'<span style="color: rgb({color[0]}, {color[1]}, {color[2]}); font-weight: bold;">{message}</span><br>'
+        # Add bold and spacing for non-colored messages
+        return f'<span style="font-weight: bold;">{message}</span><br>'
+    
+    def log_action(self, message, player_id=None):
+        """Add message to action log with player color."""
+        self.log_actions([(message, player_id)])
+    
+    def log_actions(self, entries):
+        """Add (message, player_id) entries to the action log in one update."""
+        if not entries:
+            return
+        # One paragraph per append, so the entries are spaced as separate appends would be
+        self.log_text.append('<br>'.join(self.format_message(m, p) for m, p in entries))
         # Auto-scroll to bottom
         scrollbar = self.log_text.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
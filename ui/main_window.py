@@ -4,7 +4,7 @@ MainWindow for the game UI application.
 
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, 
                              QMenuBar, QStatusBar, QMessageBox, QApplication)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction, QFont
 from ui.map_widget import MapWidget
 from ui.player_panel import PlayerPanel
@@ -12,29 +12,13 @@ from ui.dice_widget import DiceWidget
 from ui.action_panel import ActionPanel
 from ui.game_controller import GameController
 from ui.setup_dialog import SetupDialog
-from utils.player import Player
-import torch
+from ui.search_worker import SearchWorker
+from utils.frozen import frozen_path
+from utils.eval_cache import PATH as EVAL_CACHE
 import multiprocessing as mp
+import os
 
-
-class GameThread(QThread):
-    """Thread for running AI game steps."""
-    finished = pyqtSignal()
-    error = pyqtSignal(str)
-    
-    def __init__(self, controller, player_id):
-        super().__init__()
-        self.controller = controller
-        self.player_id = player_id
-    
-    def run(self):
-        """Run the AI action."""
-        try:
-            self.controller.take_ai_action(self.player_id)
-        except Exception as e:
-            self.error.emit(str(e))
-        finally:
-            self.finished.emit()
+REFRESH_INTERVAL_MS = 33  # At most one frame per interval in spectator mode
 
 
 class MainWindow(QMainWindow):
@@ -43,7 +27,17 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.controller = GameController()
-        self.game_thread = None
+        self.search_worker = SearchWorker(self.controller)  # Runs every search and judge off the UI thread
+        self.search_worker.move_finished.connect(self.on_ai_action_finished)
+        self.search_worker.error.connect(self.on_ai_error)
+        self.search_worker.start()
+        self.spectator = False  # Coalesce game signals into one refresh per interval
+        self.pending_log = []  # Action log entries not shown yet (spectator mode)
+        self.pending_winrates = None  # Latest win rates not shown yet (spectator mode)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
         self.setup_ui()
         self.connect_signals()
         
@@ -158,6 +152,15 @@ class MainWindow(QMainWindow):
         exit_action.triggered.connect(self.close)
         game_menu.addAction(exit_action)
         
+        # View menu
+        view_menu = menubar.addMenu("View")
+        
+        self.spectator_action = QAction("Spectator Mode", self)
+        self.spectator_action.setCheckable(True)
+        self.spectator_action.setShortcut("Ctrl+M")
+        self.spectator_action.toggled.connect(self.set_spectator)
+        view_menu.addAction(self.spectator_action)
+        
         # Help menu
         help_menu = menubar.addMenu("Help")
         
@@ -185,8 +188,12 @@ class MainWindow(QMainWindow):
     def initialize_game(self, config):
         """Initialize the game with configuration."""
         try:
+            from utils.player import Player  # Imports torch, deferred until a game starts
+            
             # Load model
             model_name = f'./model_offline/{config["stage"]}-{config["n_players"]}/{config["model_config"]["model_dir"]}/best_model.pth'
+            if os.path.exists(frozen_path(model_name)):
+                model_name = frozen_path(model_name)
             
             # Create players
             players = []
@@ -200,31 +207,45 @@ class MainWindow(QMainWindow):
                     player_type=player_type,
                     player_num=config["n_players"],
                     model_config=config["model_config"],
-                    player_id=i
+                    player_id=i,
+                    model_path=model_name
                 )
                 
-                player.model.load_state_dict(torch.load(model_name))
                 player.epsilon = 0.0
                 player.random = False
-                player.model.eval()
                 
                 players.append(player)
             
+            # Without AI seats the win rate judge needs its own (cached) model
+            judge_player = None
+            if not config["which_ai"]:
+                judge_player = Player('agent', config["model_config"], config["n_players"], 0, model_path=model_name)
+            
             # Initialize controller
             self.controller.initialize_game(
                 players=players,
                 player_names=config["player_names"],
                 which_ai=config["which_ai"],
                 dice_mode=config["dice_mode"],
-                search_time=config.get("search_time", 8.0)
+                search_time=config.get("search_time", 8.0),
+                judge_mode=config.get("judge_mode", "playout"),
+                dice_sampling=config.get("dice_sampling", "independent"),
+                adaptive_time=config.get("adaptive_time", False),
+                judge_player=judge_player,
+                cache=EVAL_CACHE if config.get("eval_cache", False) else None
             )
             
+            # AI-only games are watched in spectator mode
+            self.spectator_action.setChecked(len(config["which_ai"]) == config["n_players"])
+            
             # Update UI
             self.player_panel.set_players(config["player_names"], config["which_ai"])
             if hasattr(self, 'winrate_panel'):
                 self.winrate_panel.update_winrates(None, None, False, config["player_names"])
             # Clear action log when starting new game
             self.action_panel.clear_log()
+            self.pending_log = []
+            self.pending_winrates = None
             self.update_all_displays()
             
             # Start first turn
@@ -247,7 +268,7 @@ class MainWindow(QMainWindow):
         """Update all UI displays."""
         game = self.controller.get_game_state()
         if game:
-            # Update scores before displaying
+            # Update scores before displaying (the map shows these instead of scoring again)
             game.pts = game.get_current_score()
             
             # Update map
@@ -260,14 +281,45 @@ class MainWindow(QMainWindow):
                 self.controller.current_winrates if hasattr(self.controller, 'current_winrates') else None,
                 getattr(self.controller, 'last_search_times', None),
                 getattr(self.controller, '_calculating_winrate', False),
-                getattr(self.controller, 'node_winners', None)
+                getattr(self.controller, 'node_winners', None),
+                scores=game.pts
             )
             
             # Update player panel
             self.player_panel.update_all_players(game)
     
+    def set_spectator(self, enabled):
+        """Switch spectator mode, showing anything still pending when it is turned off."""
+        self.spectator = enabled
+        if not enabled and self.refresh_timer.isActive():
+            self.refresh_timer.stop()
+            self.refresh()
+    
+    def schedule_refresh(self):
+        """Refresh at the end of the current interval, however many signals arrive before."""
+        if not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+    
+    def refresh(self):
+        """Show everything that happened since the last frame (spectator mode)."""
+        self.action_panel.log_actions(self.pending_log)
+        self.pending_log = []
+        self.update_all_displays()
+        if self.pending_winrates is not None:
+            self.show_winrates(*self.pending_winrates)
+            self.pending_winrates = None
+        if self.controller.game:
+            player_id = self.controller.get_current_player()
+            player_name = self.controller.player_names[player_id] if player_id < len(self.controller.player_names) else f"Player {player_id+1}"
+            self.action_panel.set_current_player(player_id, self.controller.is_ai_player(player_id), player_name)
+            self.player_panel.set_active_player(player_id)
+            self.status_bar.showMessage(f"{player_name}'s turn")
+    
     def on_game_state_changed(self, game, player_names):
         """Handle game state change."""
+        if self.spectator:
+            self.schedule_refresh()
+            return
         self.update_all_displays()
     
     def on_turn_changed(self, player_id):
@@ -278,6 +330,12 @@ class MainWindow(QMainWindow):
         player_name = self.controller.player_names[player_id] if player_id < len(self.controller.player_names) else f"Player {player_id+1}"
         is_ai = self.controller.is_ai_player(player_id)
         
+        if self.spectator and is_ai:
+            # Panels follow at the next frame
+            self.schedule_refresh()
+            self.start_ai_action(player_id)
+            return
+        
         # Update action panel
         self.action_panel.set_current_player(player_id, is_ai, player_name)
         
@@ -298,14 +356,8 @@ class MainWindow(QMainWindow):
             self.start_ai_action(player_id)
     
     def start_ai_action(self, player_id):
-        """Start AI action in separate thread."""
-        if self.game_thread and self.game_thread.isRunning():
-            return
-        
-        self.game_thread = GameThread(self.controller, player_id)
-        self.game_thread.finished.connect(lambda: self.on_ai_action_finished(player_id))
-        self.game_thread.error.connect(self.on_ai_error)
-        self.game_thread.start()
+        """Queue the AI action on the search worker."""
+        self.search_worker.submit_move(player_id)
     
     def on_ai_action_finished(self, player_id):
         """Handle AI action completion."""
@@ -330,14 +382,26 @@ class MainWindow(QMainWindow):
             if is_ai:
                 # Add AI search times (average per move)
                 ai_search_times = getattr(self.controller, 'last_ai_search_times', None)
-                if ai_search_times is not None and ai_search_times > 0:
+                variance_reduction = self.controller.searcher.last_variance_reduction
+                if ai_search_times is not None and ai_search_times > 0 and variance_reduction is not None:
+                    log_text += f" (AI, {int(ai_search_times)} searches, variance /{variance_reduction:.1f})"
+                elif ai_search_times is not None and ai_search_times > 0:
                     log_text += f" (AI, {int(ai_search_times)} searches)"
                 else:
                     log_text += " (AI)"
-            self.action_panel.log_action(log_text, player_id)
+            if self.spectator:
+                self.pending_log.append((log_text, player_id))
+                self.schedule_refresh()
+            else:
+                self.action_panel.log_action(log_text, player_id)
     
     def on_game_ended(self, final_scores):
         """Handle game end."""
+        if self.refresh_timer.isActive():
+            # Show the final position before the dialog
+            self.refresh_timer.stop()
+            self.refresh()
+        
         msg = "Game Over!\n\nFinal Scores:\n"
         for i, score in enumerate(final_scores):
             name = self.controller.player_names[i] if i < len(self.controller.player_names) else f"Player {i+1}"
@@ -360,6 +424,18 @@ class MainWindow(QMainWindow):
     
     def on_winrate_updated(self, winrates, search_count):
         """Handle winrate update."""
+        if self.spectator:
+            # Only the latest win rates are shown at the next frame
+            self.pending_winrates = (winrates, search_count)
+            self.schedule_refresh()
+            return
+        self.show_winrates(winrates, search_count)
+        
+        # Update map with win rates and search times
+        self.update_all_displays()
+    
+    def show_winrates(self, winrates, search_count):
+        """Show win rates in the winrate, player and action panels."""
         # Update winrate panel
         self.winrate_panel.update_winrates(
             winrates,
@@ -384,9 +460,6 @@ class MainWindow(QMainWindow):
         current_player = self.controller.get_current_player()
         if current_player < len(winrates):
             self.action_panel.update_ai_status(winrates, search_count)
-        
-        # Update map with win rates and search times
-        self.update_all_displays()
     
     def on_dice_rolled(self, dice_result):
         """Handle dice roll."""
@@ -452,7 +525,7 @@ class MainWindow(QMainWindow):
     
     def closeEvent(self, event):
         """Handle window close event."""
-        if self.game_thread and self.game_thread.isRunning():
+        if self.controller.is_running and self.search_worker.is_busy():
             reply = QMessageBox.question(
                 self,
                 "Game Running",
@@ -463,5 +536,6 @@ class MainWindow(QMainWindow):
                 event.ignore()
                 return
         
+        self.search_worker.stop()
         event.accept()
 
@@ -4,8 +4,7 @@ MapWidget for displaying the game map with custom graph visualization.
 
 from PyQt6.QtWidgets import QWidget
 from PyQt6.QtCore import Qt, QPoint, QRect
-from PyQt6.QtGui import QPainter, QFont, QColor, QPen, QBrush
-import numpy as np
+from PyQt6.QtGui import QPainter, QFont, QColor, QPen, QBrush, QPixmap
 from ui.styles import PLAYER_COLORS, REGION_POSITIONS, FONT_SIZE_MEDIUM, FONT_SIZE_SMALL
 import math
 
@@ -16,6 +15,10 @@ EDGES = [[0, 1], [0, 7], [0, 8],
          [3, 6], [4, 5], [4, 7],
          [4, 9], [5, 9], [6, 10], [9, 10]]
 
+NODE_WIDTH = 80
+ROW_HEIGHT = 18
+MARGIN = 2  # The highlight border is drawn half outside the node
+
 
 class MapWidget(QWidget):
     """Widget for displaying the game map with custom graph visualization."""
@@ -30,13 +33,19 @@ class MapWidget(QWidget):
         self.region_click_callback = None
         self.last_move_regions = {}  # Track last moved regions per player {player_id: region_id}
         self.node_winners = None  # Store winning player for each node
+        self.scores = []  # Current scores shown in the score panel
+        self.signatures = []  # Per region state last painted, see node_signature
+        self.node_cache = {}  # Region index -> (signature, pixmap)
+        self.background = None  # Cached static layer, see get_background
         
         # Set minimum size
         self.setMinimumSize(800, 700)
         self.setStyleSheet("background-color: #f0f0f0;")
         
-    def update_game_state(self, game, player_names, highlight_region=None, highlight_player=None, last_move_regions=None, winrates=None, search_times=None, calculating_winrate=False, node_winners=None):
-        """Update the displayed game state."""
+    def update_game_state(self, game, player_names, highlight_region=None, highlight_player=None, last_move_regions=None, winrates=None, search_times=None, calculating_winrate=False, node_winners=None, scores=None):
+        """Update the displayed game state, repainting only the regions that changed."""
+        full = (self.game_state is None or game.player_num != self.game_state.player_num
+                or list(player_names) != list(self.player_names))
         self.game_state = game
         self.player_names = player_names
         self.highlight_region = highlight_region
@@ -46,7 +55,108 @@ class MapWidget(QWidget):
         if node_winners is not None:
             self.node_winners = node_winners
         # winrates, search_times, calculating_winrate are now handled by WinRatePanel, not displayed here
-        self.update()
+        if scores is None:
+            scores = game.get_current_score()
+        scores = [int(x) for x in scores]
+        signatures = [self.node_signature(idx) for idx in range(len(REGION_POSITIONS))]
+        
+        if full:
+            self.node_cache = {}
+            self.update()
+        else:
+            for idx, signature in enumerate(signatures):
+                if signature != self.signatures[idx]:
+                    self.update(self.dirty_rect(idx))
+            if scores != self.scores:
+                self.update(self.score_rect().adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN))
+        self.signatures = signatures
+        self.scores = scores
+    
+    def winning_player(self, idx):
+        """Player shown as holding a region: the check result, else the most soldiers."""
+        if self.node_winners is not None and idx < len(self.node_winners):
+            if self.node_winners[idx] >= 0:
+                return int(self.node_winners[idx])
+        
+        # Fallback to controlling player if no winner determined yet
+        winning_player = None
+        max_soldiers = 0
+        cnt = self.game_state.cnt
+        for p_idx in range(self.game_state.player_num):
+            if cnt[idx, p_idx] > max_soldiers:
+                max_soldiers = cnt[idx, p_idx]
+                winning_player = p_idx
+        return winning_player
+    
+    def node_signature(self, idx):
+        """Everything a region's drawing depends on, to tell which regions need repainting."""
+        highlighted = self.highlight_region == idx
+        return (int(self.game_state.values[idx]), self.winning_player(idx), highlighted,
+                self.highlight_player if highlighted else None,
+                tuple(int(c) for c in self.game_state.cnt[idx]), tuple(self.player_names))
+    
+    def node_rect(self, idx):
+        """Get the drawn rectangle of a node."""
+        pos = REGION_POSITIONS[idx]
+        node_height = 40 + self.game_state.player_num * ROW_HEIGHT
+        return QRect(pos[0] - NODE_WIDTH // 2, pos[1] - node_height // 2, NODE_WIDTH, node_height)
+    
+    def dirty_rect(self, idx):
+        """Node rectangle grown by the highlight border drawn around it."""
+        return self.node_rect(idx).adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN)
+    
+    def score_rect(self):
+        """Get the rectangle of the score panel."""
+        return QRect(10, 10, 220, self.game_state.player_num * 30 + 30)
+    
+    def resizeEvent(self, event):
+        """Drop the cached map layer, it is drawn at the widget size."""
+        self.background = None
+        super().resizeEvent(event)
+    
+    def new_pixmap(self, width, height):
+        """Transparent pixmap at the screen's pixel ratio."""
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(int(width * ratio), int(height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        return pixmap
+    
+    def get_background(self):
+        """Static map layer (background and edges), drawn once per widget size."""
+        if self.background is None:
+            self.background = self.new_pixmap(self.width(), self.height())
+            painter = QPainter(self.background)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.fillRect(self.rect(), QColor(245, 245, 245))
+            
+            # Draw edges first (so nodes appear on top)
+            painter.setPen(QPen(QColor(180, 180, 180), 1.5))
+            for edge in EDGES:
+                if len(edge) == 2:
+                    start_idx, end_idx = edge[0], edge[1]
+                    if start_idx < len(REGION_POSITIONS) and end_idx < len(REGION_POSITIONS):
+                        path = self.get_edge_path(start_idx, end_idx)
+                        if len(path) == 2:
+                            painter.drawLine(path[0], path[1])
+            painter.end()
+        return self.background
+    
+    def node_pixmap(self, idx):
+        """Cached drawing of a node, redrawn when its signature changes."""
+        signature = self.signatures[idx]
+        cached = self.node_cache.get(idx)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        rect = self.node_rect(idx)
+        pixmap = self.new_pixmap(rect.width() + 2 * MARGIN, rect.height() + 2 * MARGIN)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.draw_node(painter, idx, QRect(MARGIN, MARGIN, rect.width(), rect.height()))
+        painter.end()
+        self.node_cache[idx] = (signature, pixmap)
+        return pixmap
     
     def set_region_click_callback(self, callback):
         """Set callback for region clicks."""
@@ -104,149 +214,117 @@ class MapWidget(QWidget):
         return [start_point, end_point]
     
     def paintEvent(self, event):
-        """Paint the custom graph map."""
+        """Paint the map layer, then the nodes and score panel inside the repainted area."""
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw background
-        painter.fillRect(self.rect(), QColor(245, 245, 245))
         
         if self.game_state is None:
             # Draw placeholder
+            painter.fillRect(self.rect(), QColor(245, 245, 245))
             painter.setPen(QColor(100, 100, 100))
             painter.setFont(QFont("Arial", 16))
             painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Waiting for game to start...")
             return
         
-        # Get game state data
-        values = self.game_state.values
+        area = event.rect()
+        painter.drawPixmap(0, 0, self.get_background())  # clipped to the repainted area
+        for idx in range(len(REGION_POSITIONS)):
+            rect = self.dirty_rect(idx)
+            if rect.intersects(area):
+                painter.drawPixmap(rect.topLeft(), self.node_pixmap(idx))
+        
+        if self.score_rect().adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN).intersects(area):
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            self.draw_scores(painter)
+    
+    def draw_node(self, painter, idx, node_rect):
+        """Draw a region as a table of soldier counts in node_rect."""
+        value = int(self.game_state.values[idx])
         cnt = self.game_state.cnt
         player_num = self.game_state.player_num
+        font_header = QFont("Arial", FONT_SIZE_MEDIUM, QFont.Weight.Bold)
+        font_small = QFont("Arial", FONT_SIZE_SMALL - 2)
         
-        # Draw edges first (so nodes appear on top)
-        edge_pen = QPen(QColor(180, 180, 180), 1.5)
-        painter.setPen(edge_pen)
+        # Determine node color based on winning player (from check result)
+        winning_player = self.winning_player(idx)
         
-        for edge in EDGES:
-            if len(edge) == 2:
-                start_idx, end_idx = edge[0], edge[1]
-                if start_idx < len(REGION_POSITIONS) and end_idx < len(REGION_POSITIONS):
-                    path = self.get_edge_path(start_idx, end_idx)
-                    if len(path) == 2:
-                        painter.drawLine(path[0], path[1])
+        # Draw node background - more transparent based on winning player
+        if winning_player is not None and winning_player < len(PLAYER_COLORS):
+            color = PLAYER_COLORS[winning_player + 1]
+            node_color = QColor(color[0], color[1], color[2], 120)  # More transparent (was 200)
+        else:
+            node_color = QColor(240, 240, 240, 180)  # More transparent (was 240)
         
-        # Draw nodes (regions) as tables
-        font_header = QFont("Arial", FONT_SIZE_MEDIUM, QFont.Weight.Bold)
-        font_small = QFont("Arial", FONT_SIZE_SMALL - 2)
+        # Highlight if selected
+        if self.highlight_region == idx:
+            border_pen = QPen(QColor(255, 255, 0), 3)  # Yellow highlight
+        else:
+            border_pen = QPen(QColor(100, 100, 100), 2)
         
-        for idx, pos in enumerate(REGION_POSITIONS):
-            value = int(values[idx])
-            
-            # Determine node color based on winning player (from check result)
-            winning_player = None
-            if self.node_winners is not None and idx < len(self.node_winners):
-                if self.node_winners[idx] >= 0:
-                    winning_player = int(self.node_winners[idx])
-            
-            # Fallback to controlling player if no winner determined yet
-            if winning_player is None:
-                max_soldiers = 0
-                for p_idx in range(player_num):
-                    if cnt[idx, p_idx] > max_soldiers:
-                        max_soldiers = cnt[idx, p_idx]
-                        winning_player = p_idx
-            
-            # Node dimensions
-            node_width = 80
-            node_height = 40 + player_num * 18
-            node_rect = QRect(pos[0] - node_width // 2, pos[1] - node_height // 2, 
-                            node_width, node_height)
+        # Draw node background
+        painter.setBrush(QBrush(node_color))
+        painter.setPen(border_pen)
+        painter.drawRoundedRect(node_rect, 5, 5)
+        
+        # Draw header with value
+        header_rect = QRect(node_rect.x(), node_rect.y(), node_rect.width(), 25)
+        painter.fillRect(header_rect, QColor(255, 255, 255, 0))
+        painter.setPen(QColor(0, 0, 0))
+        painter.setFont(font_header)
+        value_text = f"Value: {value}"
+        text_rect = painter.fontMetrics().boundingRect(value_text)
+        painter.drawText(header_rect.x() + (header_rect.width() - text_rect.width()) // 2,
+                       header_rect.y() + text_rect.height() + 2, value_text)
+        
+        # Draw table rows for each player
+        y_offset = header_rect.bottom() + 2
+        
+        for player_idx in range(player_num):
+            soldier_count = int(cnt[idx, player_idx])
             
-            # Draw node background - more transparent based on winning player
-            if winning_player is not None and winning_player < len(PLAYER_COLORS):
-                color = PLAYER_COLORS[winning_player + 1]
-                node_color = QColor(color[0], color[1], color[2], 120)  # More transparent (was 200)
+            # Row background (alternating for readability)
+            row_rect = QRect(node_rect.x() + 2, y_offset, node_rect.width() - 4, ROW_HEIGHT)
+            if player_idx % 2 == 0:
+                painter.fillRect(row_rect, QColor(255, 255, 255, 150))
             else:
-                node_color = QColor(240, 240, 240, 180)  # More transparent (was 240)
+                painter.fillRect(row_rect, QColor(240, 240, 240, 150))
             
-            # Highlight if selected
-            if self.highlight_region == idx:
-                border_pen = QPen(QColor(255, 255, 0), 3)  # Yellow highlight
+            # Get player color
+            if player_idx < len(PLAYER_COLORS):
+                color = PLAYER_COLORS[player_idx + 1]
+                text_color = QColor(color[0], color[1], color[2])
             else:
-                border_pen = QPen(QColor(100, 100, 100), 2)
+                text_color = QColor(128, 128, 128)
             
-            # Draw node background
-            painter.setBrush(QBrush(node_color))
-            painter.setPen(border_pen)
-            painter.drawRoundedRect(node_rect, 5, 5)
+            # Highlight if this is the highlighted region/player
+            if self.highlight_region == idx and self.highlight_player == player_idx:
+                painter.setPen(QPen(QColor(255, 255, 0), 2))
+                painter.drawRect(row_rect)
+            else:
+                painter.setPen(Qt.PenStyle.NoPen)
             
-            # Draw header with value
-            header_rect = QRect(node_rect.x(), node_rect.y(), node_rect.width(), 25)
-            painter.fillRect(header_rect, QColor(255, 255, 255, 0))
-            painter.setPen(QColor(0, 0, 0))
-            painter.setFont(font_header)
-            value_text = f"Value: {value}"
-            text_rect = painter.fontMetrics().boundingRect(value_text)
-            painter.drawText(header_rect.x() + (header_rect.width() - text_rect.width()) // 2,
-                           header_rect.y() + text_rect.height() + 2, value_text)
+            # Draw player name and count
+            if player_idx < len(self.player_names):
+                name = self.player_names[player_idx]  # Shorten name
+            else:
+                name = f"P{player_idx+1}"
             
-            # Draw table rows for each player
-            row_height = 18
-            y_offset = header_rect.bottom() + 2
+            painter.setPen(text_color)
+            painter.setFont(font_small)
+            text = f"{name}: {soldier_count}"
+            painter.drawText(row_rect.x() + 3, row_rect.y() + row_rect.height() - 3, text)
             
-            for player_idx in range(player_num):
-                soldier_count = int(cnt[idx, player_idx])
-                
-                # Row background (alternating for readability)
-                row_rect = QRect(node_rect.x() + 2, y_offset, node_rect.width() - 4, row_height)
-                if player_idx % 2 == 0:
-                    painter.fillRect(row_rect, QColor(255, 255, 255, 150))
-                else:
-                    painter.fillRect(row_rect, QColor(240, 240, 240, 150))
-                
-                # Get player color
-                if player_idx < len(PLAYER_COLORS):
-                    color = PLAYER_COLORS[player_idx + 1]
-                    text_color = QColor(color[0], color[1], color[2])
-                else:
-                    text_color = QColor(128, 128, 128)
-                
-                # Highlight if this is the highlighted region/player
-                if self.highlight_region == idx and self.highlight_player == player_idx:
-                    painter.setPen(QPen(QColor(255, 255, 0), 2))
-                    painter.drawRect(row_rect)
-                else:
-                    painter.setPen(Qt.PenStyle.NoPen)
-                
-                # Draw player name and count
-                if player_idx < len(self.player_names):
-                    name = self.player_names[player_idx]  # Shorten name
-                else:
-                    name = f"P{player_idx+1}"
-                
-                painter.setPen(text_color)
-                painter.setFont(font_small)
-                text = f"{name}: {soldier_count}"
-                painter.drawText(row_rect.x() + 3, row_rect.y() + row_rect.height() - 3, text)
-                
-                y_offset += row_height
-        
-        # Draw scores at top-left (larger, more prominent)
-        # Always calculate current scores
-        if hasattr(self.game_state, 'get_current_score'):
-            current_scores = self.game_state.get_current_score()
-        elif hasattr(self.game_state, 'pts'):
-            current_scores = self.game_state.pts
-        else:
-            current_scores = np.zeros(player_num)
+            y_offset += ROW_HEIGHT
+    
+    def draw_scores(self, painter):
+        """Draw the current scores at top-left (larger, more prominent)."""
+        player_num = self.game_state.player_num
+        current_scores = self.scores
         
         # Score panel background - always white, never changes
         # Reset brush to white to ensure background doesn't change
         score_bg = QColor(255, 255, 255, 255)  # Fully opaque white
         painter.setBrush(QBrush(score_bg))  # Explicitly set brush to white
-        score_width = 220
-        score_height = player_num * 30 + 30
-        score_rect = QRect(10, 10, score_width, score_height)
+        score_rect = self.score_rect()
         # Fill with white background
         painter.fillRect(score_rect, score_bg)
         # Draw border
@@ -264,7 +342,7 @@ class MapWidget(QWidget):
         y_pos = score_rect.y() + 40
         
         for i in range(player_num):
-            score_val = int(current_scores[i]) if i < len(current_scores) else 0
+            score_val = current_scores[i] if i < len(current_scores) else 0
             if i < len(self.player_names):
                 text = f"{self.player_names[i]}: {score_val}"
             else:
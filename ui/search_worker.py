@@ -0,0 +1,86 @@
+"""
+SearchWorker running all AI searches and win rate judging off the UI thread.
+"""
+
+import threading
+from collections import deque
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class SearchWorker(QThread):
+    """Long-lived thread taking AI moves and judges from a queue, dropping jobs for boards that moved on."""
+    move_finished = pyqtSignal(int)  # player_id
+    error = pyqtSignal(str)
+
+    def __init__(self, controller):
+        super().__init__()
+        self.controller = controller
+        self.jobs = deque()  # (kind, player_id, snapshot or None, version, cancel event or None)
+        self.judge_cancel = None  # Cancel event of the running judge
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.busy = False  # A job is running
+        controller.core.judge_runner = self.submit_judge  # Judges after moves come here too
+
+    def submit_move(self, player_id):
+        """Queue the AI move of player_id on the current board, dropping judges that would delay it."""
+        with self.condition:
+            self.jobs = deque(job for job in self.jobs if job[0] != 'judge')
+            if self.judge_cancel is not None:
+                self.judge_cancel.set()  # The running judge stops after its current slice
+        self.submit(('move', player_id, None, self.controller.version, None))
+
+    def submit_judge(self, player_id, snapshot):
+        """Queue judging a snapshot, replacing judges still waiting for older boards."""
+        with self.condition:
+            self.jobs = deque(job for job in self.jobs if job[0] != 'judge')
+        self.submit(('judge', player_id, snapshot, snapshot[1], threading.Event()))
+
+    def submit(self, job):
+        with self.condition:
+            self.jobs.append(job)
+            self.condition.notify()
+
+    def is_busy(self):
+        """Whether a job is running or waiting."""
+        with self.condition:
+            return self.busy or bool(self.jobs)
+
+    def stop(self):
+        """Drop waiting jobs and end the thread once the running one returns."""
+        with self.condition:
+            self.jobs.clear()
+            self.stopping = True
+            self.condition.notify()
+        self.wait()
+
+    def run(self):
+        """Run queued jobs until stopped."""
+        while True:
+            with self.condition:
+                while not self.jobs and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                kind, player_id, snapshot, version, cancel = self.jobs.popleft()
+                self.judge_cancel = cancel
+                self.busy = True
+            try:
+                if version != self.controller.version:
+                    continue  # The board changed while the job waited (new game or reset)
+                if kind == 'move':
+                    moved = False
+                    try:
+                        moved = self.controller.take_ai_action(player_id)
+                    finally:
+                        # A move dropped for a new game or reset leaves the turn to that game
+                        if moved or version == self.controller.version:
+                            self.move_finished.emit(player_id)
+                else:
+                    self.controller.update_winrates(player_id, snapshot, cancel)
+            except Exception as e:
+                self.error.emit(str(e))
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.judge_cancel = None
@@ -7,7 +7,6 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QGroupBox, QMessageBox, QComboBox, QWidget)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont
-from utils.check_models import find_best
 from ui.styles import (BUTTON_STYLE, BUTTON_SECONDARY_STYLE, GROUP_BOX_STYLE, 
                       LINE_EDIT_STYLE, SPIN_BOX_STYLE, CHECK_BOX_STYLE,
                       BACKGROUND_COLOR)
@@ -82,6 +81,40 @@ class SetupDialog(QDialog):
         search_time_layout.addWidget(self.search_time_spinbox)
         layout.addLayout(search_time_layout)
         
+        # Adaptive time management
+        self.adaptive_time_checkbox = QCheckBox("Adaptive AI Time (spend more on contested moves)")
+        self.adaptive_time_checkbox.setChecked(False)
+        layout.addWidget(self.adaptive_time_checkbox)
+        
+        # Persistent evaluation cache
+        self.eval_cache_checkbox = QCheckBox("Evaluation Cache (reuse playouts across games)")
+        self.eval_cache_checkbox.setChecked(False)
+        layout.addWidget(self.eval_cache_checkbox)
+        
+        # Win rate estimation mode
+        judge_layout = QHBoxLayout()
+        judge_label = QLabel("Win Rate Mode:")
+        judge_label.setMinimumWidth(120)
+        self.judge_combo = QComboBox()
+        self.judge_combo.addItem("Playouts", "playout")
+        self.judge_combo.addItem("Network Estimate", "network")
+        self.judge_combo.addItem("Network Estimate + Playouts", "refine")
+        judge_layout.addWidget(judge_label)
+        judge_layout.addWidget(self.judge_combo)
+        layout.addLayout(judge_layout)
+        
+        # Dice sampling across candidate actions during search
+        dice_layout = QHBoxLayout()
+        dice_label = QLabel("Search Dice:")
+        dice_label.setMinimumWidth(120)
+        self.dice_combo = QComboBox()
+        self.dice_combo.addItem("Independent", "independent")
+        self.dice_combo.addItem("Common", "common")
+        self.dice_combo.addItem("Common + Stratified", "stratified")
+        dice_layout.addWidget(dice_label)
+        dice_layout.addWidget(self.dice_combo)
+        layout.addLayout(dice_layout)
+        
         # Player names and AI selection
         self.player_group = QGroupBox("Players")
         self.player_layout = QVBoxLayout()
@@ -165,8 +198,9 @@ class SetupDialog(QDialog):
         
         # Validate model exists
         try:
-            best_model_config = find_best(stage, n_players)
-            if best_model_config.empty:
+            from utils.registry import get_registry
+            best_model_config = get_registry().best(stage, n_players)
+            if best_model_config is None:
                 QMessageBox.warning(
                     self, 
                     "Model Not Found", 
@@ -174,7 +208,7 @@ class SetupDialog(QDialog):
                 )
                 return
             
-            model_dir = best_model_config.loc[0]["model_dir"]
+            model_dir = best_model_config["model_dir"]
             model_path = f'./model_offline/{stage}-{n_players}/{model_dir}/best_model.pth'
             
             if not os.path.exists(model_path):
@@ -198,8 +232,12 @@ class SetupDialog(QDialog):
         self.dice_mode = 1  # Always dice mode (fixed)
         self.player_names = player_names
         self.which_ai = which_ai
-        self.model_config = best_model_config.loc[0]
+        self.model_config = dict(best_model_config["args"], model_dir=model_dir)
         self.search_time = self.search_time_spinbox.value()
+        self.adaptive_time = self.adaptive_time_checkbox.isChecked()
+        self.eval_cache = self.eval_cache_checkbox.isChecked()
+        self.judge_mode = self.judge_combo.currentData()
+        self.dice_sampling = self.dice_combo.currentData()
         
         self.accept()
     
@@ -212,6 +250,10 @@ class SetupDialog(QDialog):
             'player_names': self.player_names,
             'which_ai': self.which_ai,
             'model_config': self.model_config,
-            'search_time': self.search_time
+            'search_time': self.search_time,
+            'adaptive_time': self.adaptive_time,
+            'eval_cache': self.eval_cache,
+            'judge_mode': self.judge_mode,
+            'dice_sampling': self.dice_sampling
         }
 
@@ -88,6 +88,13 @@ class WinRatePanel(QWidget):
                 search_label.setStyleSheet("color: rgb(100, 100, 100);")
                 group_layout.addWidget(search_label)
                 self.winrate_labels.append(search_label)
+            elif search_times == 0:
+                # Network judge: a heuristic from the move outputs, not a calibrated win rate
+                estimate_label = QLabel("Network estimate")
+                estimate_label.setFont(QFont("Arial", FONT_SIZE_SMALL - 2))
+                estimate_label.setStyleSheet("color: rgb(100, 100, 100);")
+                group_layout.addWidget(estimate_label)
+                self.winrate_labels.append(estimate_label)
         else:
             self.status_label.setText("No win rates available")
             self.status_label.setVisible(True)
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import time
+import zlib
+import multiprocessing as mp
+import numpy as np
+import torch
+from utils.search import Searcher
+from utils.arena import make_players
+from utils.record import RecordReader, NONE, dice_options
+from utils.eval_cache import EvalCache
+
+
+# Grades every move of recorded games: the options of the roll that was played are searched with
+# fixed playouts from the position before the move, and the move's loss is the best option's win
+# rate minus the chosen one's. One JSON line per game is appended to the output, which is resumed.
+
+worker = {}
+
+
+def init_worker(path, model, stage, playouts, rollout, seed, cache=None):
+    torch.set_num_threads(1)
+    worker['reader'] = RecordReader(path)
+    worker['model'] = (model, stage)
+    worker['seats'] = {}  # n_player -> players
+    worker['searcher'] = Searcher(search_time=0, processes=0, max_playouts=playouts, rollout_policy=rollout)
+    if cache is not None:
+        worker['searcher'].cache = EvalCache(cache)
+    worker['seed'] = seed
+    worker['cache'] = {}  # position and options -> searched win rates, positions repeat across games
+
+
+def seats(n_player):
+    if n_player not in worker['seats']:
+        worker['seats'][n_player], _ = make_players(*worker['model'], n_player)
+    return worker['seats'][n_player]
+
+
+def evaluate(game, player_id, actions):
+    key = b''.join([game.cnt.tobytes(), game.values.tobytes(), game.power_level.tobytes(), bytes([player_id]),
+                    bytes(actions)])
+    cache = worker['cache']
+    if key not in cache:
+        if len(cache) > 100000:
+            cache.clear()
+        Searcher.explore_opponents(game, player_id)
+        # seeded by the position, so a position gets the same grade in any worker and any run
+        seed = [worker['seed'], zlib.crc32(key)]
+        res, _ = worker['searcher'].search(game, player_id, 0, seed=seed, actions=actions)
+        cache[key] = res[actions]
+    return cache[key]
+
+
+def analyze_game(index):
+    record = worker['reader'][index]
+    game = record.replay(upto=0, players=seats(record.n_players))
+    moves = []
+    for k, move in enumerate(record.moves):
+        player_id, action = int(move['player']), int(move['action'])
+        dice = move['reroll'] if move['reroll'] != NONE else move['dice']
+        if dice != NONE:
+            soldiers = game.players[player_id].soldiers
+            chosen = action // 3 * 3 + min(action % 3, soldiers - 1)
+            actions = list(dict.fromkeys(game.option_actions(np.array(dice_options(int(dice))), player_id)))
+            if len(actions) > 1 and chosen in actions:
+                winrates = evaluate(game, player_id, actions)
+                best = int(np.argmax(winrates))
+                moves.append({'move': k, 'player': player_id, 'actions': actions, 'winrates': winrates.tolist(),
+                              'chosen': chosen, 'best': actions[best],
+                              'loss': float(winrates[best] - winrates[actions.index(chosen)])})
+        game.apply(player_id, action)
+    return {'game': index, 'moves': moves, 'summary': summarize(moves, record.n_players, game.get_current_score())}
+
+
+def summarize(moves, n_player, scores, blunder=0.1):
+    players = []
+    for p in range(n_player):
+        losses = [m['loss'] for m in moves if m['player'] == p]
+        players.append({'moves': len(losses), 'mean_loss': float(np.mean(losses)) if losses else 0.0,
+                        'total_loss': float(np.sum(losses)), 'blunders': sum(l >= blunder for l in losses)})
+    return {'scores': scores.tolist(), 'graded': len(moves), 'players': players}
+
+
+def done_games(out):
+    # games already in the output; a line cut off by a crash is dropped
+    if not os.path.exists(out):
+        return set()
+    with open(out, 'rb') as f:
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    if end < len(data):
+        with open(out, 'r+b') as f:
+            f.truncate(end)
+    return {json.loads(line)['game'] for line in data[:end].splitlines() if line.strip()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', type=str, help='record file written with --record')
+    parser.add_argument('--out', type=str, default=None, help='JSON lines output, default <path>.analysis.jsonl')
+    parser.add_argument('--model', type=str, default='best')
+    parser.add_argument('--stage', type=int, default=0)
+    parser.add_argument('--playouts', type=int, default=32, help='playouts per option')
+    parser.add_argument('--rollout', type=str, default='random', choices=['agent', 'random'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--games', type=str, default=None, help='range of games, e.g. 0:1000')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--report_every', type=int, default=100)
+    parser.add_argument('--cache', type=str, default=None, help='evaluation cache to merge the playouts with')
+    args = parser.parse_args()
+
+    mp.set_start_method('spawn', force=True)
+    out = args.out or args.path + '.analysis.jsonl'
+    with RecordReader(args.path) as reader:
+        n_games = len(reader)
+    start, stop = 0, n_games
+    if args.games is not None:
+        first, last = args.games.split(':')
+        start, stop = int(first or 0), min(int(last or n_games), n_games)
+    done = done_games(out)
+    todo = [i for i in range(start, stop) if i not in done]
+    print(f'{len(todo)} games to analyze, {stop - start - len(todo)} already in {out}')
+
+    t = time.time()
+    initargs = (args.path, args.model, args.stage, args.playouts, args.rollout, args.seed, args.cache)
+    with open(out, 'a') as f, mp.Pool(processes=args.processes, initializer=init_worker, initargs=initargs) as pool:
+        for n, result in enumerate(pool.imap_unordered(analyze_game, todo), 1):
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+            if n % args.report_every == 0 or n == len(todo):
+                elapsed = time.time() - t
+                print(f'{n}/{len(todo)} games, {n / elapsed * 3600:.0f} games per hour')
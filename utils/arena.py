@@ -0,0 +1,224 @@
+import argparse
+import json
+import math
+import os
+import time
+import multiprocessing as mp
+import numpy as np
+import torch
+from utils.game import Game
+from utils.player import Player
+from utils.search import Searcher
+from utils.registry import get_registry, read_args
+from utils.frozen import frozen_path
+from utils.inference import InferenceServer, connect
+from utils.record import GameRecord, RecordWriter
+
+defaults = {'model': 'best', 'search_time': 0.5, 'playouts': None, 'rollout': 'agent', 'reroll': 0.0, 'dice': 'independent', 'book': 0,
+            'adaptive_time': 0}
+
+
+def parse_config(text):
+    # "model=0-3/20260114134514,playouts=50,rollout=random" -> dict over the defaults
+    config = dict(defaults)
+    for item in filter(None, text.split(',')):
+        key, value = item.split('=', 1)
+        if key not in defaults:
+            raise ValueError(f'unknown arena option {key}')
+        if key in ('search_time', 'reroll'):
+            value = float(value)
+        elif key in ('playouts', 'book', 'adaptive_time'):
+            value = int(value)
+        config[key] = value
+    return config
+
+
+def resolve_model(model, stage, n_player):
+    # model dir (or 'best' by test loss) -> network config and checkpoint path, frozen when exported
+    if model == 'best':
+        model = f'{stage}-{n_player}/{get_registry().best(stage, n_player)["model_dir"]}'
+    model_dir = os.path.join('./model_offline', model)
+    model_name = os.path.join(model_dir, 'best_model.pth')
+    if os.path.exists(frozen_path(model_name)):
+        model_name = frozen_path(model_name)
+    return read_args(model_dir), model_name
+
+
+def make_players(model, stage, n_player, ai=None):
+    # players of every seat on one checkpoint, without exploration; seats outside ai (all by default) are manual
+    model_config, model_name = resolve_model(model, stage, n_player)
+    players = []
+    for i in range(n_player):
+        player = Player('agent' if ai is None or i in ai else 'manual', model_config, n_player, i, model_path=model_name)
+        player.epsilon = 0.0
+        players.append(player)
+    return players, model_name
+
+
+def build_seat(config, stage, n_player, seat):
+    model_config, model_name = resolve_model(config['model'], stage, n_player)
+    player = Player('agent', model_config, n_player, seat, model_path=model_name)
+    player.epsilon = 0.0
+    searcher = Searcher(search_time=config['search_time'], processes=0, dice_sampling=config['dice'],
+                        max_playouts=config['playouts'], rollout_policy=config['rollout'],
+                        reroll_margin=config['reroll'], adaptive_time=bool(config['adaptive_time']),
+                        n_players=n_player)
+    if config['book']:
+        from utils.book import OpeningBook, book_path
+        searcher.book = OpeningBook(book_path(model_name))
+    return player, searcher
+
+
+worker = {}
+
+
+def init_worker(configs, stage, n_player, inference=None, record=False):
+    # every process keeps one player and searcher per (config, seat) for all its games
+    torch.set_num_threads(1)
+    if inference is not None:
+        connect(inference)
+    worker['n_player'] = n_player
+    worker['record'] = record
+    worker['seats'] = {(c, s): build_seat(configs[c], stage, n_player, s) for c in range(2) for s in range(n_player)}
+
+
+def play_game(job):
+    index, seed = job
+    n_player = worker['n_player']
+    seat_a = index % n_player  # config A rotates through every seat, config B fills the others
+    seats = [worker['seats'][(0 if s == seat_a else 1, s)] for s in range(n_player)]
+    # one int64 seed per game, the form a record stores, so a recorded game replays with its dice and searches
+    game_seed = int(np.random.SeedSequence([seed, index]).generate_state(1, np.uint64)[0] >> 1)
+    game = Game([p for p, _ in seats], dice=1, rng=np.random.default_rng(game_seed))
+    game.reset()
+    for _, searcher in seats:
+        if searcher.time_manager is not None:
+            searcher.time_manager.reset()  # every game starts with a full time budget
+    record = GameRecord.start(game, game_seed) if worker['record'] else None
+    idx = 0
+    while not game.terminal():
+        player = game.players[idx]
+        if player.soldiers > 0:
+            searcher = seats[idx][1]
+            if searcher.search_time <= 0 and searcher.max_playouts is None:
+                player.random = False
+                option, _ = game.step(idx)  # network policy without search
+                if record is not None:
+                    record.add(game, idx, option[0] * 3 + option[1])
+            else:
+                best, search_times = searcher.choose(game, idx)
+                game.apply(idx, best)
+                if record is not None:
+                    record.add(game, idx, best, playouts=search_times.sum(), winrate=searcher.last_winrate)
+        idx = (idx + 1) % n_player
+    scores = game.get_current_score()
+    winner = int(np.argsort(scores)[-1])
+    return index, seat_a, winner, scores.tolist(), record.to_bytes() if record is not None else None
+
+
+def wilson(wins, n, z=1.96):
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return center - half, center + half
+
+
+class SPRT:
+    # Wald's sequential test of H0: p = p0 against H1: p = p1 on A's win indicator
+    def __init__(self, p0, p1, alpha=0.05, beta=0.05):
+        self.win = math.log(p1 / p0)
+        self.loss = math.log((1 - p1) / (1 - p0))
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.llr = 0.0
+
+    def update(self, win):
+        self.llr += self.win if win else self.loss
+        return self.result()
+
+    def result(self):
+        if self.llr >= self.upper:
+            return 'H1'
+        if self.llr <= self.lower:
+            return 'H0'
+        return None
+
+
+def summarize(results, n_player, sprt, elapsed):
+    n = len(results)
+    wins = sum(r[2] == r[1] for r in results)
+    low, high = wilson(wins, n)
+    by_seat = {}
+    for s in range(n_player):
+        games = [r for r in results if r[1] == s]
+        by_seat[s] = {'games': len(games), 'winrate': sum(r[2] == s for r in games) / max(len(games), 1)}
+    return {'games': n, 'wins': int(wins), 'winrate': wins / max(n, 1), 'ci95': [low, high],
+            'baseline': 1 / n_player, 'by_seat': by_seat, 'llr': sprt.llr,
+            'llr_bounds': [sprt.lower, sprt.upper], 'sprt': sprt.result(), 'seconds': elapsed,
+            'games_per_sec': n / max(elapsed, 1e-9)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--a', type=str, default='')
+    parser.add_argument('--b', type=str, default='')
+    parser.add_argument('--stage', type=int, default=0)
+    parser.add_argument('--n_player', type=int, default=3)
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--delta', type=float, default=0.05)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--no_sprt', action='store_true')
+    parser.add_argument('--report_every', type=int, default=50)
+    parser.add_argument('--inference', action='store_true', help='batch all network calls in one inference process')
+    parser.add_argument('--out', type=str, default=None)
+    parser.add_argument('--record', type=str, default=None, help='append the games to this record file')
+    args = parser.parse_args()
+
+    mp.set_start_method('spawn', force=True)
+    configs = [parse_config(args.a), parse_config(args.b)]
+    p0 = 1 / args.n_player
+    sprt = SPRT(p0, p0 + args.delta, args.alpha, args.beta)
+    results = []
+    start = time.time()
+    jobs = [(i, args.seed) for i in range(args.games)]
+    server = None
+    if args.inference:
+        models = {}
+        for c in configs:
+            model_config, model_name = resolve_model(c['model'], args.stage, args.n_player)
+            models[model_name] = model_config
+        server = InferenceServer(list(models.items()), args.n_player)
+    initargs = (configs, args.stage, args.n_player, server.client if server else None, args.record is not None)
+    recorder = RecordWriter(args.record) if args.record is not None else None
+    with mp.Pool(processes=args.processes, initializer=init_worker, initargs=initargs) as pool:
+        # leaving the pool terminates the games still running once the test has decided
+        for res in pool.imap_unordered(play_game, jobs):
+            if recorder is not None:
+                recorder.append(res[4])
+            res = res[:4]
+            results.append(res)
+            decision = sprt.update(res[2] == res[1])
+            if len(results) % args.report_every == 0:
+                report = summarize(results, args.n_player, sprt, time.time() - start)
+                print(f'{report["games"]} games : A winrate {report["winrate"]:.3f} '
+                      f'[{report["ci95"][0]:.3f}, {report["ci95"][1]:.3f}], llr {report["llr"]:.2f}')
+            if decision is not None and not args.no_sprt:
+                break
+    if server is not None:
+        server.close()
+    if recorder is not None:
+        recorder.close()
+
+    report = summarize(results, args.n_player, sprt, time.time() - start)
+    report['a'] = configs[0]
+    report['b'] = configs[1]
+    report = json.dumps(report, indent=2)
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            f.write(report)
+    print(report)
@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+import torch
+from utils.game import Game
+from utils.search import Searcher
+from utils.player import Player
+from utils.registry import get_registry
+from utils.frozen import frozen_path
+from utils.core import GameCore
+
+
+def timeit(func, min_time=1.0, min_runs=3):
+    # calls per second of func, run for at least min_time seconds
+    func()
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and runs >= min_runs:
+            return runs / elapsed
+
+
+def model_config(stage, n_player):
+    # best run's config and checkpoint, or an untrained default when none is on disk
+    registry = get_registry()
+    best = registry.best(stage, n_player)
+    if best is None:
+        return {'embed_dim': 256, 'nlayer': 3, 'gcn': 1}, None
+    model_name = registry.checkpoint(stage, n_player, best)
+    return best['args'], model_name if os.path.exists(model_name) else None
+
+
+def make_players(n_player, player_type='agent', stage=0, frozen=False):
+    config, model_name = model_config(stage, n_player)
+    if model_name is not None and frozen and os.path.exists(frozen_path(model_name)):
+        model_name = frozen_path(model_name)
+    players = [Player(player_type, config, n_player, i, model_path=model_name) for i in range(n_player)]
+    for p in players:
+        if player_type == 'agent':
+            p.model.eval()
+            p.epsilon = 0.0
+    return players, model_name
+
+
+def play_random_game(game):
+    game.reset()
+    idx = 0
+    steps = 0
+    while not game.terminal():
+        if game.step(idx)[1]:
+            steps += 1
+        idx = (idx + 1) % game.player_num
+    return steps
+
+
+def bench_engine(n_player, min_time):
+    players = [Player('random', player_num=n_player, player_id=i) for i in range(n_player)]
+    game = Game(players, dice=1, rng=np.random.default_rng(0))
+
+    steps = play_random_game(game)
+    games_per_sec = timeit(lambda: play_random_game(game), min_time)
+    scores_per_sec = timeit(lambda: game.get_current_score(), min_time, min_runs=100)
+    return {'steps_per_sec': games_per_sec * steps, 'games_per_sec': games_per_sec, 'scores_per_sec': scores_per_sec}
+
+
+def bench_playouts(n_player, policy, min_time):
+    players, model_name = make_players(n_player)
+    game = Game(players, dice=1, rng=np.random.default_rng(0))
+    start = time.perf_counter()
+    points, cnt, events = Searcher.simulate(game, 0, min_time, 0, seed=0, policy=policy)
+    elapsed = time.perf_counter() - start  # simulate finishes the playout running at min_time
+    return {'playouts_per_sec': cnt / elapsed, 'elapsed_sec': elapsed, 'checkpoint': model_name}
+
+
+def bench_model(n_player, batch_sizes, min_time):
+    res = {}
+    for frozen in [False, True]:
+        players, model_name = make_players(n_player, frozen=frozen)
+        if frozen and (model_name is None or not model_name.endswith('.pt')):
+            continue
+        model = players[0].model
+        device = players[0].device
+        static = model.static_feature(torch.arange(11, device=device).float() + 2, torch.eye(11, device=device))
+        for bs in batch_sizes:
+            state = torch.randint(0, 4, (bs, 11 * n_player), device=device).float()
+            with torch.no_grad():
+                calls = timeit(lambda: model.forward_static(state, *static), min_time)
+            res[f'{"frozen" if frozen else "eager"}_bs{bs}'] = {'latency_ms': 1000 / calls, 'samples_per_sec': calls * bs}
+    res['device'] = str(device)
+    return res
+
+
+def noop(x):
+    return x
+
+
+def random_games(n_player, games):
+    players = [Player('random', player_num=n_player, player_id=i) for i in range(n_player)]
+    game = Game(players, dice=1, rng=np.random.default_rng(0))
+    for _ in range(games):
+        play_random_game(game)
+    return games
+
+
+def bench_pool(processes, games=20):
+    # pool creation, the first no-op tasks answered (spawned workers importing this module) and
+    # random games played on every process
+    ctx = mp.get_context('spawn')
+    start = time.perf_counter()
+    with ctx.Pool(processes=processes) as pool:
+        created = time.perf_counter() - start
+        pool.map(noop, range(processes), chunksize=1)
+        first_tasks = time.perf_counter() - start
+        start_work = time.perf_counter()
+        played = sum(pool.starmap(random_games, [(3, games)] * processes, chunksize=1))
+        work = time.perf_counter() - start_work
+    return {'processes': processes, 'create_sec': created, 'first_tasks_sec': first_tasks,
+            'random_games_sec': work, 'random_games_per_sec': played / work,
+            'total_sec': time.perf_counter() - start}
+
+
+def bench_ai_move(n_player, search_time, moves):
+    players, model_name = make_players(n_player, frozen=True)
+    core = GameCore()
+    core.initialize_game(players, [f'P{i+1}' for i in range(n_player)], list(range(n_player)), 1,
+                         search_time=search_time, seed=0)
+    latency = []
+    for _ in range(moves):
+        if not core.step_turn():
+            break
+        start = time.perf_counter()
+        core.take_ai_action(core.get_current_player())
+        latency.append(time.perf_counter() - start)
+    return {'search_time': search_time, 'moves': len(latency), 'latency_sec_mean': float(np.mean(latency)),
+            'latency_sec_max': float(np.max(latency)), 'checkpoint': model_name}
+
+
+# runs play_ui up to the setup dialog, printing when the dialog is on screen
+SHOW_DIALOG = '''
+import os, sys, time
+from PyQt6.QtWidgets import QApplication
+import ui.setup_dialog
+def shown(self):
+    self.show()
+    QApplication.processEvents()
+    print(time.time())
+    sys.stdout.flush()
+    os._exit(0)
+ui.setup_dialog.SetupDialog.exec = shown
+import play_ui
+play_ui.main()
+'''
+
+
+def import_times(module):
+    # cumulative import time in ms of the top level modules imported by module (python -X importtime)
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True).stderr
+    res = {}
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if len(name) - len(name.lstrip()) <= 3:  # module and its direct imports
+            res[name.strip()] = int(cumulative) / 1000
+    return dict(sorted(res.items(), key=lambda x: -x[1])[:10])
+
+
+def bench_startup(runs):
+    env = dict(os.environ)
+    if 'DISPLAY' not in env and 'WAYLAND_DISPLAY' not in env:
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+    dialog = []
+    for _ in range(runs):
+        start = time.time()
+        out = subprocess.run([sys.executable, '-c', SHOW_DIALOG], capture_output=True, text=True, env=env).stdout
+        dialog.append(float(out.split()[-1]) - start)
+    return {'setup_dialog_sec_mean': float(np.mean(dialog)), 'setup_dialog_sec_min': float(np.min(dialog)),
+            'import_ms_play_ui': import_times('play_ui'), 'import_ms_utils_player': import_times('utils.player')}
+
+
+def meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'torch': torch.__version__, 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpu_count': os.cpu_count()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', type=str, default=None)
+    parser.add_argument('--only', type=str, default='startup,engine,playout,model,pool,move')
+    parser.add_argument('--min_time', type=float, default=2.0)
+    parser.add_argument('--search_time', type=float, default=1.0)
+    parser.add_argument('--moves', type=int, default=3)
+    args = parser.parse_args()
+
+    mp.set_start_method('spawn', force=True)
+    torch.set_num_threads(1)
+    only = args.only.split(',')
+    results = {}
+    for n in [2, 3]:
+        if 'engine' in only:
+            results[f'engine_{n}p'] = bench_engine(n, args.min_time)
+        if 'playout' in only:
+            for policy in ['random', 'agent']:
+                results[f'playout_{policy}_{n}p'] = bench_playouts(n, policy, args.min_time)
+        if 'model' in only:
+            results[f'model_{n}p'] = bench_model(n, [1, 8, 32, 128], args.min_time)
+        if 'move' in only:
+            results[f'ai_move_{n}p'] = bench_ai_move(n, args.search_time, args.moves)
+    if 'startup' in only:
+        results['startup'] = bench_startup(3)
+    if 'pool' in only:
+        results['pool'] = bench_pool(5)
+
+    report = json.dumps({'meta': meta(), 'results': results}, indent=2)
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            f.write(report)
+    print(report)
@@ -0,0 +1,147 @@
+import argparse
+import os
+import time
+import multiprocessing as mp
+import numpy as np
+import torch
+from utils.game import Game, SYMMETRIES, canonical
+from utils.search import Searcher
+from utils.arena import resolve_model, make_players
+
+
+# Opening book: a cache of searched positions, the win rates of all 33 actions for the first move on an
+# empty board, one entry per value assignment up to the board's symmetries. Only the opening move of the
+# game (seat 0, before anyone has deployed) is covered, every later move is searched. There are about
+# 20 million such positions, so a book of a few thousand entries is rarely hit; lookups and hits are
+# counted to show how often it answers. Entries are sorted by the rank of the canonical assignment so a
+# lookup is a binary search over the memory-mapped file.
+ENTRY = np.dtype([('key', '<u4'), ('winrate', '<f2', (33,)), ('playouts', '<u4')])
+MIN_PLAYOUTS = 1000  # entries searched with fewer playouts per action than this are searched again in the game
+SEAT = 0  # the seat every entry is searched for, the one to move on an empty board
+FACTORIALS = [1]
+for i in range(1, 11):
+    FACTORIALS.append(FACTORIALS[-1] * i)
+POSITIONS = FACTORIALS[10] * 11 // len(SYMMETRIES)  # opening positions up to symmetry
+
+
+def rank(values):
+    # Lehmer rank of the assignment of values 2..12 to the 11 regions
+    items = list(range(2, 13))
+    r = 0
+    for i, v in enumerate(values):
+        j = items.index(v)
+        r += j * FACTORIALS[10 - i]
+        items.pop(j)
+    return r
+
+
+def book_path(model_path):
+    # a book is searched with one model's playouts and kept next to its checkpoint
+    return os.path.join(os.path.dirname(model_path), 'book.npy')
+
+
+class OpeningBook:
+    def __init__(self, path, min_playouts=MIN_PLAYOUTS):
+        self.path = path
+        self.entries = np.load(path, mmap_mode='r')
+        self.keys = self.entries['key']
+        self.min_playouts = min_playouts
+        self.lookups = 0  # opening positions looked up
+        self.hits = 0  # of which answered from the book
+
+    def __len__(self):
+        return len(self.entries)
+
+    def coverage(self):
+        return len(self) / POSITIONS
+
+    def report(self):
+        return (f'opening book: {len(self)} of {POSITIONS} positions ({self.coverage():.4%}), '
+                f'{self.hits} hits in {self.lookups} lookups')
+
+    def lookup(self, game, player_id):
+        # win rates and playouts of the 33 actions, or None outside the book (any board but the empty one)
+        # or when the entry has fewer than min_playouts per action
+        if player_id != SEAT or game.cnt.any():
+            return None
+        self.lookups += 1
+        values, sym = canonical(game.values)
+        key = rank(values)
+        i = np.searchsorted(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key or self.entries[i]['playouts'] < self.min_playouts:
+            return None
+        self.hits += 1
+        order = np.array([sym[a // 3] * 3 + a % 3 for a in range(33)])
+        entry = self.entries[i]
+        return entry['winrate'][order].astype(float), np.full(33, int(entry['playouts']))
+
+
+worker = {}
+
+
+def init_worker(model, stage, n_player, playouts, rollout):
+    torch.set_num_threads(1)
+    players, _ = make_players(model, stage, n_player)
+    worker['game'] = Game(players, dice=1)
+    Searcher.explore_opponents(worker['game'], SEAT)
+    worker['searcher'] = Searcher(search_time=0, processes=0, max_playouts=playouts, rollout_policy=rollout)
+
+
+def search_position(values):
+    game = worker['game']
+    game.reset()
+    game.set_values(np.array(values))
+    res, counts = worker['searcher'].search(game, SEAT, 0, seed=rank(values))
+    return rank(values), res, counts.min()
+
+
+def save(path, entries):
+    entries = np.sort(entries, order='key')
+    tmp = path + '.tmp.npy'
+    np.save(tmp, entries)
+    os.replace(tmp, path)
+    return entries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Search opening positions (first move on an empty board) into a '
+                                                 'cache next to the model. It is not a general opening book: '
+                                                 'only positions searched here are answered.')
+    parser.add_argument('--stage', type=int, default=0)
+    parser.add_argument('--n_player', type=int, default=3)
+    parser.add_argument('--model', type=str, default='best')
+    parser.add_argument('--positions', type=int, default=1000, help='new value assignments to search')
+    parser.add_argument('--playouts', type=int, default=2000, help='playouts per action')
+    parser.add_argument('--rollout', type=str, default='agent', choices=['agent', 'random'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--save_every', type=int, default=50)
+    parser.add_argument('--out', type=str, default=None, help='book file, default book.npy next to the model')
+    args = parser.parse_args()
+
+    mp.set_start_method('spawn', force=True)
+    _, model_name = resolve_model(args.model, args.stage, args.n_player)
+    out = args.out or book_path(model_name)
+    entries = np.load(out) if os.path.exists(out) else np.zeros(0, dtype=ENTRY)
+    known = set(entries['key'].tolist())
+    print(f'{len(entries)} positions in {out}, {len(entries) / POSITIONS:.4%} of {POSITIONS}')
+
+    # value assignments in a fixed random order, so reruns continue where the last one stopped
+    rng = np.random.default_rng(args.seed)
+    todo = []
+    while len(todo) < args.positions and len(known) < POSITIONS:
+        values, _ = canonical(rng.permutation(11) + 2)
+        if rank(values) not in known:
+            known.add(rank(values))
+            todo.append(values)
+
+    t = time.time()
+    new = []
+    initargs = (args.model, args.stage, args.n_player, args.playouts, args.rollout)
+    with mp.Pool(processes=args.processes, initializer=init_worker, initargs=initargs) as pool:
+        for n, (key, res, playouts) in enumerate(pool.imap_unordered(search_position, todo), 1):
+            new.append((key, res, playouts))
+            if n % args.save_every == 0 or n == len(todo):
+                entries = save(out, np.concatenate([entries, np.array(new, dtype=ENTRY)]))
+                new = []
+                print(f'{n}/{len(todo)} positions, {len(entries)} in the book, {(time.time() - t) / n:.1f}s per position')
@@ -1,24 +1,10 @@
-import glob
-import pandas as pd
-import os
+from utils.registry import get_registry
 
-def find_best(stage, n_player):
-    filepaths = glob.glob(f'./model_offline/{stage}-{n_player}/*/args.csv')
-
-    dfs = []
-    for fp in filepaths:
-        df = pd.read_csv(fp)
-
-        model_dir = os.path.basename(os.path.dirname(fp))
-        df['model_dir'] = model_dir
 
-        dfs.append(df)
-
-    all_args_df = pd.concat(dfs, ignore_index=True)
-
-    sorted_df = all_args_df.sort_values(by='test_loss', ascending=True).reset_index(drop=True)
+def find_best(stage, n_player):
+    # run configs (args.csv plus model_dir) sorted by test_loss, best first
+    return [dict(run['args'], model_dir=run['model_dir']) for run in get_registry().runs(stage, n_player)]
 
-    return sorted_df
 
 if __name__ == '__main__':
     print(find_best(0, 2))
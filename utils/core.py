@@ -0,0 +1,372 @@
+from utils.game import Game
+from utils.search import Searcher
+from utils.record import GameRecord
+from copy import deepcopy
+import numpy as np
+import math
+import os
+
+JUDGE_SLICE = 1.0  # Seconds of playouts between checks that a background judge is still wanted
+
+
+class GameCore:
+    """Game state and turn sequencing without any UI, reporting changes through events."""
+    
+    # Events and their arguments
+    events = {
+        'game_state_changed': 'game, player_names',
+        'turn_changed': 'current_player_id',
+        'action_taken': 'player_id, action_region, soldiers, dice_result',
+        'game_ended': 'final_scores',
+        'winrate_updated': 'winrates, search_count',
+        'winrate_calculating': '',  # Starting winrate calculation
+        'dice_rolled': 'dice_result',
+        'action_options_updated': 'options',
+    }
+    
+    def __init__(self):
+        self.listeners = {}  # event name -> callbacks
+        self.game = None
+        self.player_names = []
+        self.which_ai = []
+        self.current_player_id = 0
+        self.is_running = False
+        self.search_time = 2.0
+        self.current_options = None  # Store current dice options
+        self.current_dice_values = None  # Store actual dice values (0-5, representing 1-6)
+        self.has_rerolled = False  # Track if reroll has been used this turn
+        self.last_move_region = {}  # Track last moved region for each player {player_id: region_id}
+        self.current_winrates = None  # Store current win rates for all players
+        self.last_search_times = None  # Store last search times (for judge)
+        self.last_ai_search_times = None  # Store last AI player search times (average per move)
+        self._calculating_winrate = False  # Flag for winrate calculation
+        self.node_winners = None  # Store winning player for each node
+        self.judge_mode = 'playout'  # 'playout', 'network' (uncalibrated estimate) or 'refine' (network then playouts)
+        self.searcher = Searcher(search_time=self.search_time)
+        self.inference_server = None  # Batching inference process used by the searcher's pool workers
+        self.recorder = None  # RecordWriter finished games are appended to
+        self.record = None  # GameRecord of the game being played
+        self.version = 0  # Bumped whenever the board changes, background results of older boards are dropped
+        self.judge_runner = None  # Called with (player_id, snapshot) to judge off the caller's thread instead
+        
+    def initialize_game(self, players, player_names, which_ai, dice_mode, search_time=8.0, judge_mode='playout', dice_sampling='independent', seed=None, max_playouts=None, adaptive_time=False, processes=5, judge_player=None, pool=None, inference=False, cache=None):
+        """Initialize the game with players."""
+        self.game = Game(players=players, dice=dice_mode, rng=np.random.default_rng(seed))
+        self.player_names = player_names
+        self.which_ai = which_ai
+        self.current_player_id = 0
+        self.is_running = True
+        self.search_time = search_time  # Set AI search time
+        self.judge_mode = judge_mode
+        self.searcher = Searcher(search_time=search_time, processes=processes, dice_sampling=dice_sampling,
+                                 max_playouts=max_playouts, adaptive_time=adaptive_time, n_players=len(players),
+                                 pool=pool)
+        # Judge with an AI player's model unless a separate judge is given (no AI seats)
+        self.searcher.model_player = judge_player or next((p for p in players if p.model is not None), None)
+        if self.searcher.model_player is not None:
+            from utils.book import OpeningBook, book_path
+            path = book_path(self.searcher.model_player.model_path)
+            if os.path.exists(path):
+                self.searcher.book = OpeningBook(path)
+        if cache is not None:
+            # Playouts of positions searched before, stored in a file shared with other sessions
+            from utils.eval_cache import EvalCache
+            self.searcher.cache = EvalCache(cache)
+        if self.inference_server is not None:
+            self.inference_server.close()
+            self.inference_server = None
+        if inference and processes > 0:
+            # Playouts in the pool workers send their forward passes to one batching process
+            from utils.inference import InferenceServer
+            model = self.searcher.model_player
+            self.inference_server = InferenceServer([(model.model_path, model.model_config)], len(players))
+            self.searcher.inference = self.inference_server.client
+        self.game.reset()
+        self.version += 1
+        self.record = GameRecord.start(self.game, seed)
+        self.emit('game_state_changed', self.game, self.player_names)
+    
+    def reset_game(self):
+        """Reset the game to initial state."""
+        if self.game:
+            self.game.reset()
+            self.version += 1
+            self.record = GameRecord.start(self.game)
+            if self.searcher.time_manager is not None:
+                self.searcher.time_manager.reset()
+            self.current_player_id = 0
+            # Update node winners after reset
+            self.node_winners = self.game.get_node_winners()
+            self.emit('game_state_changed', self.game, self.player_names)
+    
+    def on(self, event, callback):
+        """Call callback with the event's arguments whenever event is emitted."""
+        if event not in self.events:
+            raise ValueError(f'unknown event {event}')
+        self.listeners.setdefault(event, []).append(callback)
+    
+    def emit(self, event, *args):
+        """Notify the callbacks registered for event."""
+        for callback in self.listeners.get(event, []):
+            callback(*args)
+    
+    def get_current_player(self):
+        """Get the current player."""
+        if self.game:
+            return self.current_player_id % self.game.player_num
+        return 0
+    
+    def is_ai_player(self, player_id):
+        """Check if a player is AI."""
+        return player_id in self.which_ai
+    
+    def snapshot(self):
+        """Copy of the board and its version for work done while the game goes on."""
+        # Copies share the game's dice stream, the copy gets a generator of its own seeded now so
+        # background work never draws from the game's generator at unpredictable times
+        game = deepcopy(self.game)
+        game.set_rng(np.random.default_rng(self.searcher.next_seed(self.game)))
+        return game, self.version
+    
+    def request_winrates(self, player_id):
+        """Judge the state after a move, in the background when a judge runner is set."""
+        if self.judge_runner is not None:
+            self.judge_runner(player_id, self.snapshot())
+        else:
+            self.update_winrates(player_id)
+    
+    def update_winrates(self, player_id, snapshot=None, cancel=None):
+        """Judge the current state (or a snapshot of an earlier one) and notify the UI."""
+        game, version = snapshot or (self.game, self.version)
+        # A snapshot is judged in slices, each refining the shown win rates until the board moves on
+        # or cancel (a threading.Event) is set, e.g. because an AI move is waiting for the search
+        slices = max(math.ceil(self.search_time / JUDGE_SLICE), 1) if snapshot is not None else 1
+        
+        if self.judge_mode in ('network', 'refine'):
+            winrate, search_times_judge = self.searcher.network_judge(game)
+            if version != self.version:
+                return
+            self.current_winrates = winrate
+            self.last_search_times = search_times_judge
+            self.emit('winrate_updated', winrate, search_times_judge)
+        
+        if self.judge_mode in ('playout', 'refine'):
+            self._calculating_winrate = True
+            self.emit('winrate_calculating')
+            seed = self.searcher.next_seed(game)
+            wins = np.zeros(game.player_num)
+            total = 0
+            try:
+                for k in range(slices):
+                    winrate, search_times_judge = self.searcher.judge(game, player_id, self.search_time / slices,
+                                                                      seed=seed if slices == 1 else [seed, k])
+                    if self.searcher.cache is None and slices > 1:
+                        # With a cache every slice already returns all playouts of the position
+                        wins += np.array(winrate) * search_times_judge
+                        total += search_times_judge
+                        winrate, search_times_judge = (wins / max(total, 1)).tolist(), total
+                    if version != self.version or (cancel is not None and cancel.is_set()):
+                        return
+                    self.current_winrates = winrate  # Store win rates
+                    self.last_search_times = int(search_times_judge)
+                    if k == slices - 1:
+                        self._calculating_winrate = False
+                    self.emit('winrate_updated', winrate, int(search_times_judge))
+            finally:
+                self._calculating_winrate = False
+    
+    def take_ai_action(self, player_id):
+        """Take action for AI player."""
+        # The search may run off the UI thread, a new game or reset meanwhile must not receive this move
+        game, searcher, record, version = self.game, self.searcher, self.record, self.version
+        if not game or player_id not in self.which_ai:
+            return False
+        
+        if game.players[player_id].soldiers == 0:
+            return False
+        
+        # Roll first and only search the options on the table
+        best, search_times = searcher.choose(game, player_id)
+        if version != self.version:
+            return False
+        self.current_dice_values = [d + 1 for d in game.last_dice_values]
+        
+        # Store average search time per move (for action log)
+        searched = search_times[search_times > 0]
+        self.last_ai_search_times = np.mean(searched) if len(searched) > 0 else 0
+        
+        # Take action
+        soldiers_deployed = game.apply(player_id, best)
+        self.version += 1
+        record.add(game, player_id, best, playouts=search_times.sum(), winrate=searcher.last_winrate)
+        action_region = best // 3
+        self.last_move_region[player_id] = action_region  # Track moved region
+        self.emit('action_taken', player_id, action_region, soldiers_deployed, [])
+        
+        # Calculate winrates
+        self.request_winrates(player_id)
+        
+        # Update node winners after move
+        if self.game:
+            self.node_winners = self.game.get_node_winners()
+        
+        self.emit('game_state_changed', self.game, self.player_names)
+        
+        # Advance to next player after action is complete
+        self.current_player_id += 1
+        return True
+    
+    def roll_dice_for_player(self, player_id):
+        """Roll dice and return options for a player."""
+        if not self.game:
+            return None
+        
+        # Use game's roll_dice function
+        options = self.game.roll_dice()
+        
+        # Get dice values from game (stored after roll_dice call)
+        if self.game.last_dice_values:
+            self.current_dice_values = [d + 1 for d in self.game.last_dice_values]  # Convert 0-5 to 1-6
+        else:
+            self.current_dice_values = None
+        
+        self.current_options = options  # Store for later use
+        self.has_rerolled = False  # Reset reroll flag for new turn
+        self.emit('dice_rolled', options.tolist())
+        self.emit('action_options_updated', options.tolist())
+        return options
+    
+    def reroll_dice_for_player(self, player_id):
+        """Reroll dice for a manual player."""
+        if not self.game or player_id in self.which_ai:
+            return False
+        
+        if self.game.players[player_id].soldiers == 0:
+            return False
+        
+        # Only allow reroll once per turn (always dice mode)
+        if self.has_rerolled:
+            return False
+        
+        # Use game's roll_dice function
+        options = self.game.roll_dice(reroll=1)
+        
+        # Get dice values from game (stored after roll_dice call)
+        if self.game.last_dice_values:
+            self.current_dice_values = [d + 1 for d in self.game.last_dice_values]  # Convert 0-5 to 1-6
+        else:
+            self.current_dice_values = None
+        
+        self.current_options = options  # Store for later use
+        self.has_rerolled = True  # Mark reroll as used
+        self.emit('dice_rolled', options.tolist())
+        self.emit('action_options_updated', options.tolist())
+        return True
+    
+    def take_manual_action(self, player_id, action_index, reroll=False):
+        """Take action for manual player."""
+        if not self.game or player_id in self.which_ai:
+            return False
+        
+        if self.game.players[player_id].soldiers == 0:
+            return False
+        
+        # Get the stored options (should be set by roll_dice_for_player)
+        if self.current_options is None:
+            # Fallback: use game's roll_dice if not set
+            options = self.game.roll_dice()
+            self.current_options = options
+            if self.game.last_dice_values:
+                self.current_dice_values = [d + 1 for d in self.game.last_dice_values]
+            else:
+                self.current_dice_values = None
+        else:
+            options = self.current_options
+        
+        # Always dice mode: action_index is 0, 1, or 2
+        if action_index < 0 or action_index >= 3:
+            return False
+        
+        chosen_option = action_index
+        option = options[chosen_option].copy()
+        # option[0] is dice[0] + dice[1] (0-10), which represents region value - 2
+        # Convert region value to region index using v2p (same as game.step does)
+        option[0] = self.game.v2p[option[0]]
+        
+        # Execute the action
+        soldiers_deployed = int(self.game.apply(player_id, option[0] * 3 + option[1]))
+        self.version += 1
+        self.record.add(self.game, player_id, option[0] * 3 + option[1], option=chosen_option)
+        
+        # Track moved region
+        self.last_move_region[player_id] = option[0]
+        self.emit('action_taken', player_id, option[0], soldiers_deployed, options.tolist())
+        self.current_options = None  # Clear after use
+        self.current_dice_values = None  # Clear dice values
+        self.has_rerolled = False  # Reset reroll flag for next turn
+        
+        # Calculate winrates after manual action
+        self.request_winrates(player_id)
+        
+        # Update node winners after move
+        if self.game:
+            self.node_winners = self.game.get_node_winners()
+        
+        self.emit('game_state_changed', self.game, self.player_names)
+        
+        # Advance to next player after action is complete
+        self.current_player_id += 1
+        return True
+    
+    def step_turn(self):
+        """Advance to next turn."""
+        if not self.game:
+            return False
+        
+        # Check if game ended
+        if self.game.terminal():
+            final_pts = self.game.get_current_score(final=True)
+            self.save_record()
+            self.emit('game_ended', final_pts.tolist())
+            self.is_running = False
+            return False
+        
+        player_id = self.get_current_player()
+        
+        # Skip players with no soldiers
+        while self.game.players[player_id].soldiers == 0:
+            self.current_player_id += 1
+            player_id = self.get_current_player()
+            if self.game.terminal():
+                final_pts = self.game.get_current_score(final=True)
+                self.save_record()
+                self.emit('game_ended', final_pts.tolist())
+                self.is_running = False
+                return False
+        
+        if player_id in self.which_ai:
+            # AI player - emit turn changed, action is taken by the caller
+            self.emit('turn_changed', player_id)
+            return True
+        else:
+            # Manual player - wait for input
+            self.emit('turn_changed', player_id)
+            return True
+    
+    def save_record(self):
+        """Append the finished game to the recorder, once."""
+        if self.recorder is not None and self.record is not None:
+            self.recorder.append(self.record)
+            self.recorder.flush()
+            self.record = None
+    
+    def get_game_state(self):
+        """Get current game state."""
+        return self.game
+    
+    def get_scores(self):
+        """Get current scores."""
+        if self.game:
+            return self.game.get_current_score()
+        return None
+
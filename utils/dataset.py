@@ -4,7 +4,7 @@ from torch.utils.data import Dataset
 import math
 
 class game_dataset(Dataset):
-    def __init__(self, file, mode, n_player, seq, min, max):
+    def __init__(self, file, mode, n_player, seq, min, max, value=False):
         super().__init__()
 
         self.file = file
@@ -13,6 +13,7 @@ class game_dataset(Dataset):
         self.seq = seq
         self.min = min
         self.max = max
+        self.value = value
         self.load_data()
 
     def load_data(self):
@@ -39,6 +40,9 @@ class game_dataset(Dataset):
             self.state = self.state[:cut]
 
         self.gt = self.norm_by_dist(self.gt)
+        # value target: the normalised win rate of the best action of the player to move, a max over
+        # searched estimates, not the outcome of the game
+        self.value_gt = torch.max(self.gt, dim=-1).values
         self.len = self.gt.shape[0]
         print(f"{self.mode} dataset: {self.len} samples")
 
@@ -60,4 +64,6 @@ class game_dataset(Dataset):
         return self.len
 
     def __getitem__(self, index):
+        if self.value:
+            return self.state[index], self.net[index], self.gt[index], self.value_gt[index]
         return self.state[index], self.net[index], self.gt[index]
@@ -0,0 +1,245 @@
+import argparse
+import itertools
+import json
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import warnings
+import multiprocessing as mp
+import numpy as np
+from utils.shared_state import state_size, write_state, read_state, shareable, game_spec, template
+from utils.search import Searcher
+
+
+# Messages are 4-byte big-endian lengths followed by JSON, one job per connection.
+# worker -> coordinator on connect: {"processes": n}
+# coordinator -> worker: {"spec", "board", "player_id", "search_time", "max_playouts", "policy", "tasks": [[action, seed], ...]}
+# worker -> coordinator per finished task: {"task", "playouts", "wins": [P], "scores": [P]}, then {"done": true}
+# A coordinator closing the connection abandons the job, its tasks not started yet are skipped.
+
+worker = {}
+
+
+def send(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+
+def recv(sock):
+    head = recv_exactly(sock, 4)
+    return json.loads(recv_exactly(sock, struct.unpack('>I', head)[0]))
+
+
+def recv_exactly(sock, n):
+    buf = b''
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        buf += chunk
+    return buf
+
+
+def from_json(spec):
+    # JSON turns the spec's tuples into lists, templates are cached by the hashable form
+    dice, players = spec
+    return dice, tuple((path, tuple(tuple(kv) for kv in config), epsilon, random) for path, config, epsilon, random in players)
+
+
+def run_task(spec, board, player_id, search_time, max_playouts, policy, job, task, action, seed):
+    if worker['cancelled'].get(job):
+        return task, 0, None, None
+    game = template(spec)
+    read_state(game, np.array(board))
+    points, cnt, _ = Searcher.simulate(game, player_id, search_time, action, seed=seed,
+                                       max_playouts=max_playouts, policy=policy)
+    winners = np.argsort(points, axis=1)[:, -1]
+    return task, cnt, np.bincount(winners, minlength=game.player_num).tolist(), points.sum(axis=0).tolist()
+
+
+class WorkerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        job_id = next(server.job_ids)
+        finished = threading.Event()
+        try:
+            send(self.request, {'processes': server.processes})
+            job = recv(self.request)
+            threading.Thread(target=watch, args=(self.request, server.cancelled, job_id, finished), daemon=True).start()
+            args = (from_json(job['spec']), job['board'], job['player_id'], job['search_time'],
+                    job['max_playouts'], job['policy'], job_id)
+            tasks = [args + (i, action, seed) for i, (action, seed) in enumerate(job['tasks'])]
+            for task, cnt, wins, scores in server.pool.imap_unordered(star_task, tasks):
+                if wins is not None:
+                    send(self.request, {'task': task, 'playouts': cnt, 'wins': wins, 'scores': scores})
+            finished.set()
+            server.cancelled.pop(job_id, None)
+            send(self.request, {'done': True})
+        except (ConnectionError, OSError, ValueError):
+            server.cancelled[job_id] = True  # coordinator gone or past its deadline
+
+
+def watch(sock, cancelled, job_id, finished):
+    # the coordinator sends nothing during a job, so the read returns once it closes the connection
+    try:
+        sock.recv(1)
+    except OSError:
+        pass
+    if not finished.is_set():
+        cancelled[job_id] = True
+
+
+def star_task(args):
+    return run_task(*args)
+
+
+def warm_up(cancelled):
+    # import torch when the worker starts rather than in the first search's deadline
+    import utils.player
+    worker['cancelled'] = cancelled  # job id -> True once its coordinator is gone
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, processes):
+        super().__init__(address, WorkerHandler)
+        self.processes = processes
+        self.manager = mp.Manager()
+        self.cancelled = self.manager.dict()
+        self.job_ids = itertools.count()
+        self.pool = mp.Pool(processes=processes, initializer=warm_up, initargs=(self.cancelled,))
+
+
+class Coordinator:
+    # Root-parallel search over worker hosts: same board, disjoint seeds, statistics merged as tasks finish
+
+    def __init__(self, hosts, connect_timeout=1.0, grace=2.0):
+        self.hosts = hosts  # [(host, port), ...]
+        self.connect_timeout = connect_timeout
+        self.grace = grace  # seconds past search_time before a worker's missing tasks are given up
+        self.last_stats = None  # tasks sent, finished and workers used by the last search
+        # A search with fixed playouts has no time budget: it waits for every task, and hosts that die
+        # without closing their connection are found by TCP keepalive instead of a deadline
+
+    def connect(self):
+        workers = []
+        for host, port in self.hosts:
+            try:
+                sock = socket.create_connection((host, port), timeout=self.connect_timeout)
+                keepalive(sock)
+                workers.append((sock, recv(sock)['processes']))
+            except (OSError, ValueError):
+                continue  # dead or unreachable worker
+        return workers
+
+    def search(self, game, player_id, search_time, seed=None, actions=None, max_playouts=None, policy='agent'):
+        if actions is None:
+            actions = list(range(33))
+        if not shareable(game):
+            raise ValueError('remote search needs players loaded from checkpoints')
+        workers = self.connect()
+        if not workers:
+            raise ConnectionError('no search workers reachable')
+
+        # one task per remote process, split over the actions
+        total = sum(p for _, p in workers)
+        chunks = max(total // len(actions), 1)
+        tasks = [a for _ in range(chunks) for a in actions]
+        seeds = [[int(x) for x in s.generate_state(4)] for s in np.random.SeedSequence(seed).spawn(len(tasks))]
+        slots = [w for w, (_, p) in enumerate(workers) for _ in range(p)]
+        assigned = [[] for _ in workers]
+        for i in range(len(tasks)):
+            assigned[slots[i % len(slots)]].append(i)
+
+        board = np.zeros(state_size(game.player_num))
+        write_state(game, board)
+        results = queue.Queue()
+        for (sock, processes), ids in zip(workers, assigned):
+            if not ids:
+                continue
+            # a worker with more tasks than processes runs them in waves, each wave gets its share of the time
+            waves = -(-len(ids) // processes)
+            job = {'spec': game_spec(game), 'board': board.tolist(), 'player_id': player_id,
+                   'search_time': search_time / waves, 'max_playouts': max_playouts, 'policy': policy,
+                   'tasks': [[tasks[i], seeds[i]] for i in ids]}
+            threading.Thread(target=self.collect, args=(sock, job, ids, results), daemon=True).start()
+
+        wins = np.zeros(33)
+        counts = np.zeros(33, dtype=int)
+        finished = 0
+        deadline = time.time() + search_time + self.grace if max_playouts is None else None
+        pending = sum(1 for ids in assigned if ids)
+        while pending > 0:
+            try:
+                item = results.get(timeout=None if deadline is None else max(deadline - time.time(), 0))
+            except queue.Empty:
+                break  # slow workers past the deadline
+            if item is None:
+                pending -= 1
+                continue
+            task, cnt, task_wins = item
+            wins[tasks[task]] += task_wins[player_id]
+            counts[tasks[task]] += cnt
+            finished += 1
+        for sock, _ in workers:
+            sock.close()
+
+        self.last_stats = {'tasks': len(tasks), 'finished': finished, 'workers': len(workers)}
+        if finished < len(tasks):
+            warnings.warn(f'remote search finished {finished} of {len(tasks)} tasks, the win rates use fewer playouts')
+        res = np.divide(wins, counts, out=np.zeros(33), where=counts > 0)
+        return res, counts
+
+    @staticmethod
+    def collect(sock, job, ids, results):
+        try:
+            sock.settimeout(None)
+            send(sock, job)
+            while True:
+                message = recv(sock)
+                if message.get('done'):
+                    break
+                results.put((ids[message['task']], message['playouts'], message['wins']))
+        except (OSError, ValueError):
+            pass  # worker died, its finished tasks are already merged
+        results.put(None)
+
+
+def keepalive(sock, idle=5, interval=2, count=3):
+    # a host that stops answering is dropped after about idle + interval * count seconds
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for name, value in [('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)]:
+        if hasattr(socket, name):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+
+def parse_hosts(text):
+    hosts = []
+    for item in text.split(','):
+        host, port = item.rsplit(':', 1)
+        hosts.append((host, int(port)))
+    return hosts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--processes', type=int, default=mp.cpu_count())
+    args = parser.parse_args()
+
+    mp.set_start_method('spawn', force=True)
+    server = WorkerServer((args.host, args.port), args.processes)
+    print(f'Search worker on {args.host}:{args.port} with {args.processes} processes')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.pool.terminate()
+        server.manager.shutdown()
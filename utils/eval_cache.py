@@ -0,0 +1,100 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+from utils.game import canonical
+
+PATH = './model_offline/eval_cache.db'
+
+
+# Playout statistics of searched positions, kept across sessions and processes in SQLite.
+# A position is keyed by its canonical board (regions relabelled by the board symmetry), the player
+# to move and the playout configuration. Rows hold summed wins and playouts per slot: the action
+# (canonical region * 3 + soldiers - 1) for searches and the player for judged win rates, so new
+# samples are merged by addition. WAL mode lets any number of processes read while one writes.
+class EvalCache:
+    def __init__(self, path=PATH, enough=1000, timeout=30.0):
+        self.path = path
+        self.enough = enough  # playouts per slot at which a position is answered without searching
+        self.timeout = timeout
+        self.local = threading.local()  # one connection per thread (server sessions search in threads)
+
+    def __getstate__(self):
+        # each process opens its own connections
+        state = self.__dict__.copy()
+        del state['local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def connect(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS stats (key BLOB, slot INTEGER, wins REAL, n INTEGER, '
+                       'PRIMARY KEY (key, slot)) WITHOUT ROWID')
+            db.commit()
+            self.local.db = db
+        return db
+
+    @staticmethod
+    def position(game, player_id, kind, config):
+        # key of the canonical position and the region map into it
+        values, sym = canonical(game.values)
+        cnt = np.zeros_like(game.cnt)
+        cnt[list(sym)] = game.cnt
+        h = hashlib.sha1()
+        for part in [kind, config, str(game.player_num), str(player_id), str(game.remain_player)]:
+            h.update(part.encode() + b'\0')
+        for arr in [np.array(values), cnt, game.power_level, np.array([p.soldiers for p in game.players])]:
+            h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+        return h.digest()[:16], sym
+
+    @staticmethod
+    def slots(sym, actions):
+        return [sym[a // 3] * 3 + a % 3 for a in actions]
+
+    def get(self, key, slots):
+        rows = self.connect().execute(f'SELECT slot, wins, n FROM stats WHERE key = ? AND slot IN '
+                                      f'({",".join("?" * len(slots))})', [key] + list(slots)).fetchall()
+        found = {slot: (wins, n) for slot, wins, n in rows}
+        wins = np.array([found.get(s, (0.0, 0))[0] for s in slots])
+        counts = np.array([found.get(s, (0.0, 0))[1] for s in slots], dtype=int)
+        return wins, counts
+
+    def add(self, key, slots, wins, counts):
+        rows = [(key, int(s), float(w), int(n)) for s, w, n in zip(slots, wins, counts) if n > 0]
+        if not rows:
+            return
+        db = self.connect()
+        with db:
+            db.executemany('INSERT INTO stats VALUES (?, ?, ?, ?) ON CONFLICT (key, slot) '
+                           'DO UPDATE SET wins = wins + excluded.wins, n = n + excluded.n', rows)
+
+    def close(self):
+        db = getattr(self.local, 'db', None)
+        if db is not None:
+            db.close()
+            self.local.db = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path', type=str, default=PATH)
+    parser.add_argument('--clear', action='store_true')
+    args = parser.parse_args()
+
+    cache = EvalCache(args.path)
+    db = cache.connect()
+    if args.clear:
+        with db:
+            db.execute('DELETE FROM stats')
+        db.execute('VACUUM')
+    positions, rows, playouts = db.execute('SELECT COUNT(DISTINCT key), COUNT(*), COALESCE(SUM(n), 0) FROM stats').fetchone()
+    print(f'{positions} positions, {rows} entries, {playouts} playouts, {os.path.getsize(args.path) / 1e6:.1f}MB')
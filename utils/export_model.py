@@ -0,0 +1,72 @@
+import argparse
+import glob
+import os
+import numpy as np
+import torch
+from utils.model import Transformer_model
+from utils.game import edges
+from utils.frozen import frozen_path, load_frozen
+from utils.registry import read_args
+
+
+def build_model(n_player, args, model_name):
+    model = Transformer_model(player_num=n_player,
+                              embed_dim=args['embed_dim'],
+                              nlayers=args['nlayer'],
+                              gcn=args['gcn'],
+                              value_head=args.get('value_head', 0))
+    model.load_state_dict(torch.load(model_name, map_location='cpu'))
+    model.eval()
+    return model
+
+
+def export(model, path):
+    with torch.no_grad():
+        frozen = torch.jit.freeze(torch.jit.script(model), preserved_attrs=['forward_static', 'value_static', 'static_feature'])
+    frozen.save(path)
+    return path
+
+
+def random_inputs(n_player, n):
+    states, nets = [], []
+    for _ in range(n):
+        cnt = np.zeros((11, n_player))
+        for p in range(n_player):
+            np.add.at(cnt[:, p], np.random.randint(11, size=np.random.randint(19)), 1)
+        values = np.random.permutation(11) + 2
+
+        net = np.zeros((11, 11))
+        for e in edges:
+            lo, hi = (e[0], e[1]) if values[e[0]] < values[e[1]] else (e[1], e[0])
+            net[lo, hi] = 1
+        states.append(np.concatenate([cnt.reshape(-1), values]))
+        nets.append(net + np.eye(11))
+    return torch.from_numpy(np.array(states)).float(), torch.from_numpy(np.array(nets)).float()
+
+
+def verify(model, frozen, n_player, n=256):
+    state, net = random_inputs(n_player, n)
+    with torch.no_grad():
+        batched = (model(state, net) - frozen(state, net)).abs().max().item()
+        single = max((model(state[i], net[i]) - frozen(state[i], net[i])).abs().max().item() for i in range(8))
+        static = max((model(state[i], net[i]) - frozen.forward_static(state[i:i+1, :-11], *frozen.static_feature(state[i, -11:], net[i]))).abs().max().item() for i in range(8))
+    return max(batched, single, static)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stage', type=str, default='*')
+    parser.add_argument('--n_player', type=str, default='*')
+    parser.add_argument('--samples', type=int, default=256)
+    parser.add_argument('--atol', type=float, default=1e-4)
+    args = parser.parse_args()
+
+    for model_name in sorted(glob.glob(f'./model_offline/{args.stage}-{args.n_player}/*/best_model.pth')):
+        model_dir = os.path.dirname(model_name)
+        n_player = int(os.path.basename(os.path.dirname(model_dir)).split('-')[1])
+        model = build_model(n_player, read_args(model_dir), model_name)
+
+        path = export(model, frozen_path(model_name))
+        err = verify(model, load_frozen(path), n_player, args.samples)
+        status = 'ok' if err <= args.atol else 'MISMATCH'
+        print(f'{path} : max abs diff {err:.2e} [{status}]')
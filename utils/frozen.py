@@ -0,0 +1,20 @@
+import os
+
+
+def frozen_path(model_name):
+    return os.path.splitext(model_name)[0] + '.pt'
+
+
+# TorchScript modules can't be pickled, so players reload them by path.
+# Keep one instance per process to make that cheap.
+_loaded = {}
+
+
+def load_frozen(path, device='cpu'):
+    key = (os.path.abspath(path), str(device))
+    if key not in _loaded:
+        import torch
+        model = torch.jit.load(path, map_location=device)
+        model.eval()
+        _loaded[key] = model
+    return _loaded[key]
@@ -7,17 +7,117 @@ edges = [[0, 1], [0, 7], [0, 8],
          [3, 6], [4, 5], [4, 7],
          [4, 9], [5, 9], [6, 10], [9, 10]]
 
+def automorphisms():
+    # region permutations keeping the edges (regions 1 and 7 swap on this board)
+    adjacent = np.zeros((11, 11), dtype=bool)
+    for a, b in edges:
+        adjacent[a, b] = adjacent[b, a] = True
+    found = []
+
+    def extend(perm):
+        i = len(perm)
+        if i == 11:
+            found.append(tuple(perm))
+            return
+        for j in range(11):
+            if j not in perm and all(adjacent[k, i] == adjacent[perm[k], j] for k in range(i)):
+                extend(perm + [j])
+    extend([])
+    return found
+
+SYMMETRIES = automorphisms()
+
+def canonical(values):
+    # smallest relabelling of the region values by a symmetry and the region map into it
+    best, best_sym = None, None
+    for sym in SYMMETRIES:
+        relabelled = [0] * 11
+        for region, v in enumerate(values):
+            relabelled[sym[region]] = int(v)
+        if best is None or relabelled < best:
+            best, best_sym = relabelled, sym
+    return best, best_sym
+
+def encode_state(cnt, player_id):
+    # network input counts of player_id: the (11, P) counts cut into P rows of 11, the player's row first
+    n_players = cnt.shape[1]
+    indices = [player_id] + [i for i in range(n_players) if i != player_id]
+    return cnt.reshape(-1, 11)[indices].reshape(-1)
+
+def decode_state(s, player_id, n_players):
+    # (11, P) counts of a network input encoded for player_id
+    indices = [player_id] + [i for i in range(n_players) if i != player_id]
+    rows = np.zeros((n_players, 11), dtype=np.asarray(s).dtype)
+    rows[indices] = np.asarray(s).reshape(n_players, 11)
+    return rows.reshape(11, n_players)
+
+def dice_sequence(seed, n_players):
+    # one roll per (player, move, reroll) so candidate actions stay in step
+    return np.random.default_rng(seed).integers(6, size=(n_players, 18, 2, 3))
+
+def dice_outcome(index):
+    return [index // 36, index // 6 % 6, index % 6]
+
+# (value - 2, soldiers - 1) of the three options for each of the 216 rolls
+all_options = np.array([[[i + j, k // 2], [i + k, j // 2], [j + k, i // 2]]
+                        for i in range(6) for j in range(6) for k in range(6)])
+
+class RandomStream:
+    # Generator plus dice drawn from it in bulk. Copies of a game share the
+    # stream, so playouts started from one deepcopied game keep drawing fresh dice.
+    def __init__(self, rng=None, size=4096):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.size = size
+        self.buffer = []
+        self.pos = size
+
+    def refill(self):
+        self.buffer = self.rng.integers(6, size=(self.size, 3)).tolist()
+        self.pos = 0
+
+    def dice(self):
+        if self.pos >= self.size:
+            self.refill()
+        self.pos += 1
+        return self.buffer[self.pos - 1]
+
+    def __deepcopy__(self, memo):
+        return self
+
 class Game:
-    def __init__(self, players, dice=0):
+    def __init__(self, players, dice=0, rng=None):
         self.player_num = len(players)
         self.players = players
         self.dice = dice
         self.last_dice_values = None  # Store last rolled dice values (0-5, representing 1-6)
+        self.dice_seq = None  # Pre-sampled dice indexed by (player, move, reroll)
+        self.rolled = []  # Dice of the current turn, the first roll and any reroll
+        self.set_rng(rng)
         self.reset()
 
+    def set_rng(self, rng):
+        self.set_stream(RandomStream(rng))
+
+    def set_stream(self, stream):
+        self.stream = stream
+        for player in self.players:
+            player.stream = stream
+
     def reset(self):
-        self.values = np.arange(11) + 2
-        np.random.shuffle(self.values)
+        values = np.arange(11) + 2
+        self.stream.rng.shuffle(values)
+        self.set_values(values)
+
+        self.cnt = np.zeros((11, self.player_num))
+        self.pts = np.zeros(self.player_num)
+        self.remain_player = self.player_num
+        self.power_level = np.zeros(self.player_num)
+        self.moves = np.zeros(self.player_num, dtype=int)
+        for i in range(self.player_num):
+            self.players[i].reset()
+
+    def set_values(self, values):
+        self.values = np.asarray(values)
         self.v2p = {}
         for i in range(11):
             self.v2p[self.values[i]-2] = i
@@ -37,24 +137,21 @@ class Game:
         
         self.net = self.net * value_net
 
-        self.cnt = np.zeros((11, self.player_num))
-        self.pts = np.zeros(self.player_num)
-        self.remain_player = self.player_num
-        self.power_level = np.zeros(self.player_num)
-        for i in range(self.player_num):
-            self.players[i].reset()
-
     def step(self, player_id, force_move=-1, by_search=False, search_result=None, verbose=False):
         if self.players[player_id].soldiers == 0:
             return None, False
 
-        options = self.roll_dice()
+        if force_move != -1:
+            self.apply(player_id, force_move)
+            return [force_move // 3, force_move % 3], True
+
+        options = self.roll_dice(player_id)
         if self.dice == 1 and verbose:
             self.print_options(options)
         chosen_option, reroll = self.players[player_id].action(options, self.cnt, self.v2p, self.net, self.values, by_search, search_result, verbose, self.dice, True)
 
         if reroll:
-            options = self.roll_dice()
+            options = self.roll_dice(player_id, 1)
             if self.dice == 1 and verbose:
                 self.print_options(options)
             chosen_option, reroll = self.players[player_id].action(options, self.cnt, self.v2p, self.net, self.values, by_search, search_result, verbose, self.dice, False)
@@ -65,22 +162,42 @@ class Game:
         else:
             option = [chosen_option // 3, chosen_option % 3]
 
-        if force_move != -1:
-            self.cnt[force_move // 3, player_id] += min(force_move % 3 + 1, self.players[player_id].soldiers)
-            self.players[player_id].soldiers -= min(force_move % 3 + 1, self.players[player_id].soldiers)
-        else:
-            self.cnt[option[0], player_id] += min(option[1] + 1, self.players[player_id].soldiers)
-            self.players[player_id].soldiers -= min(option[1] + 1, self.players[player_id].soldiers)
+        self.apply(player_id, option[0] * 3 + option[1])
+        return option, True
+
+    def apply(self, player_id, action):
+        soldiers = min(action % 3 + 1, self.players[player_id].soldiers)
+        self.cnt[action // 3, player_id] += soldiers
+        self.players[player_id].soldiers -= soldiers
 
         if self.players[player_id].soldiers == 0:
             self.power_level[player_id] = self.remain_player
             self.remain_player -= 1
-        
-        return option, True
+        self.moves[player_id] += 1
+        return soldiers
 
-    def roll_dice(self):
-        dice = [np.random.randint(6) for i in range(3)]
+    def option_actions(self, options, player_id):
+        # action ids (region * 3 + soldiers - 1) of dice options, capped by remaining soldiers
+        soldiers = self.players[player_id].soldiers
+        return [int(self.v2p[o[0]] * 3 + min(o[1], soldiers - 1)) for o in options]
+
+    def reroll_value(self, score, player_id):
+        # expected value of the best option over the 216 possible rolls
+        v2p = np.array([self.v2p[i] for i in range(11)])
+        soldiers = self.players[player_id].soldiers
+        actions = v2p[all_options[:, :, 0]] * 3 + np.minimum(all_options[:, :, 1], soldiers - 1)
+        return np.mean(np.max(score[actions], axis=1))
+
+    def roll_dice(self, player_id=None, reroll=0):
+        if self.dice_seq is not None and player_id is not None:
+            dice = list(self.dice_seq[player_id, self.moves[player_id], reroll])
+        else:
+            dice = self.stream.dice()
         self.last_dice_values = dice  # Store dice values (0-5, representing 1-6)
+        if reroll:
+            self.rolled.append(dice)
+        else:
+            self.rolled = [dice]
         res = np.array([[dice[0] + dice[1], dice[2] // 2],
                         [dice[0] + dice[2], dice[1] // 2],
                         [dice[2] + dice[1], dice[0] // 2]])
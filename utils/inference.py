@@ -0,0 +1,178 @@
+import os
+import queue
+import time
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import torch
+from utils import model_cache
+
+
+# Requests are rows of a shared float32 array: [model index, head, state (11 * P), values (11), network (11 * 11)].
+# Clients take a free slot per row, write their rows, queue the slot ids as one request and wait on the slots'
+# semaphores for the 33 action values (head 0) or the value in the first column (head 1) the server writes
+# into the output array. The last output column flags rows whose batch failed on the server.
+
+
+class InferenceClient:
+    # Picklable handle passed to worker processes (pool initializer arguments)
+
+    def __init__(self, ctx, models, player_num, slots):
+        self.models = [m for m, _ in models]
+        self.player_num = player_num
+        self.slots = slots
+        self.width = 2 + 11 * player_num + 11 + 121
+        self.requests = ctx.Queue()
+        self.free = ctx.Queue()
+        for i in range(slots):
+            self.free.put(i)
+        self.done = [ctx.Semaphore(0) for _ in range(slots)]
+        self.shm_in = shared_memory.SharedMemory(create=True, size=slots * self.width * 4)
+        self.shm_out = shared_memory.SharedMemory(create=True, size=slots * 34 * 4)
+        self.name_in, self.name_out = self.shm_in.name, self.shm_out.name
+        self.attach()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for k in ['shm_in', 'shm_out', 'inputs', 'outputs']:
+            state.pop(k, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm_in = shared_memory.SharedMemory(name=self.name_in)
+        self.shm_out = shared_memory.SharedMemory(name=self.name_out)
+        self.attach()
+
+    def attach(self):
+        self.inputs = np.ndarray((self.slots, self.width), dtype=np.float32, buffer=self.shm_in.buf)
+        self.outputs = np.ndarray((self.slots, 34), dtype=np.float32, buffer=self.shm_out.buf)
+
+    def forward(self, index, states, values, network, head=0):
+        # outputs of a batch of states [B, 11 * P] on one board, sent as one request
+        states = states.reshape(-1, 11 * self.player_num)
+        slots = [self.free.get() for _ in states]
+        for slot, state in zip(slots, states):
+            row = self.inputs[slot]
+            row[0] = index
+            row[1] = head
+            row[2:2 + 11 * self.player_num] = state
+            row[2 + 11 * self.player_num:13 + 11 * self.player_num] = values
+            row[13 + 11 * self.player_num:] = network.reshape(-1)
+        self.requests.put(slots)
+        for slot in slots:
+            self.done[slot].acquire()
+        out = self.outputs[slots].copy()
+        for slot in slots:
+            self.free.put(slot)
+        if out[:, 33].any():
+            raise RuntimeError('inference server failed on this request, see its output for the error')
+        return out[:, :33]
+
+    def close(self):
+        self.shm_in.close()
+        self.shm_out.close()
+
+
+class RemoteModel:
+    # Stands in for Transformer_model inside Player.action, sending each forward pass to the server
+
+    def __init__(self, client, index):
+        self.client = client
+        self.index = index
+
+    def static_feature(self, values, network):
+        # the server computes (and caches) static features per board
+        return values.cpu().numpy(), network.cpu().numpy()
+
+    def forward_static(self, state, values, network):
+        out = self.client.forward(self.index, state.cpu().numpy(), values, network)
+        return torch.from_numpy(out).squeeze()
+
+    def value_static(self, state, values, network):
+        out = self.client.forward(self.index, state.cpu().numpy(), values, network, head=1)
+        return torch.from_numpy(out[:, 0])
+
+    def eval(self):
+        return self
+
+
+def connect(client):
+    # pool initializer: players loading a served checkpoint get a RemoteModel instead of the network
+    model_cache.remote = {os.path.abspath(path): RemoteModel(client, i) for i, path in enumerate(client.models)}
+
+
+def serve(client, models, max_batch, max_wait):
+    torch.set_num_threads(1)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    nets = [model_cache.load_model(path, config, client.player_num, device) for path, config in models]
+    width = 11 * client.player_num
+    statics = {}
+    while True:
+        request = client.requests.get()
+        if request is None:
+            break
+        slots = list(request)
+        # collect until the batch is full or the oldest request has waited max_wait
+        deadline = time.perf_counter() + max_wait
+        while len(slots) < max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = client.requests.get(timeout=remaining) if remaining > 0 else client.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                client.requests.put(None)
+                break
+            slots.extend(request)
+
+        rows = client.inputs[slots]
+        client.outputs[slots, 33] = 0
+        groups = {}
+        for i, row in enumerate(rows):
+            groups.setdefault((int(row[0]), int(row[1]), row[2 + width:].tobytes()), []).append(i)
+        with torch.no_grad():
+            for (index, head, key), members in groups.items():
+                try:
+                    if (index, key) not in statics:
+                        if len(statics) > 1024:
+                            statics.clear()
+                        board = rows[members[0], 2 + width:]
+                        v = torch.from_numpy(board[:11].copy()).to(device)
+                        network = torch.from_numpy(board[11:].reshape(11, 11).copy()).to(device)
+                        statics[(index, key)] = nets[index].static_feature(v, network)
+                    state = torch.from_numpy(rows[members, 2:2 + width]).to(device)
+                    if head == 1:
+                        out = nets[index].value_static(state, *statics[(index, key)]).reshape(-1).cpu().numpy()
+                        for i, o in zip(members, out):
+                            client.outputs[slots[i], 0] = o
+                        continue
+                    out = nets[index].forward_static(state, *statics[(index, key)]).reshape(-1, 33).cpu().numpy()
+                    for i, o in zip(members, out):
+                        client.outputs[slots[i], :33] = o
+                except Exception:
+                    # the clients of this group raise, the server keeps serving the others
+                    traceback.print_exc()
+                    for i in members:
+                        client.outputs[slots[i], 33] = 1
+        for slot in slots:
+            client.done[slot].release()
+    client.close()
+
+
+class InferenceServer:
+    # Process owning the models and batching the forward passes of all search workers
+
+    def __init__(self, models, player_num, slots=128, max_batch=64, max_wait=0.002):
+        ctx = mp.get_context('spawn')
+        self.client = InferenceClient(ctx, models, player_num, slots)
+        self.process = ctx.Process(target=serve, args=(self.client, models, max_batch, max_wait), daemon=True)
+        self.process.start()
+
+    def close(self):
+        self.client.requests.put(None)
+        self.process.join()
+        self.client.close()
+        self.client.shm_in.unlink()
+        self.client.shm_out.unlink()
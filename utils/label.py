@@ -0,0 +1,156 @@
+import argparse
+import os
+import time
+import multiprocessing as mp
+import numpy as np
+import torch
+from utils.game import Game, decode_state
+from utils.search import Searcher
+from utils.arena import resolve_model, make_players
+from utils.inference import InferenceServer, connect
+
+
+# Monte Carlo targets for stored states: all 33 actions of the player to move are searched with fixed
+# playouts and their win rates are written as gt next to s and net, the layout game_dataset reads.
+# The playouts behind every target are kept in n, so a rerun skips labelled states and a rerun with
+# more playouts refines gt by merging the new playouts with the old ones.
+# A state is the network input of the seat that saved it (Player.buffer_s): counts encoded for that
+# seat, then region values. The seat of every state comes from a seat array in the file or --seat.
+# Region adjacency is rebuilt from the values, net is only carried over to the output.
+
+worker = {}
+
+
+def init_worker(model, stage, n_player, rollout, seed, inference=None):
+    torch.set_num_threads(1)
+    if inference is not None:
+        connect(inference)
+    players, _ = make_players(model, stage, n_player)
+    worker['game'] = Game(players, dice=1)
+    worker['rollout'] = rollout
+    worker['seed'] = seed
+
+
+def decode(s, seat, n_player):
+    # counts and soldiers left per player of a stored state, None when the state is not a position to search
+    cnt = decode_state(np.rint(s[:-11]), seat, n_player)
+    soldiers = 18 - cnt.sum(axis=0).astype(int)
+    if (cnt < 0).any() or (soldiers < 0).any() or soldiers[seat] == 0:
+        return None
+    return cnt, soldiers
+
+
+def set_state(game, s, seat):
+    # board of a stored state with the seat that saved it to move
+    n_player = game.player_num
+    game.reset()
+    game.set_values(s[-11:].astype(int))
+    cnt, soldiers = decode(s, seat, n_player)
+    game.cnt = cnt.astype(float)
+    for player, left in zip(game.players, soldiers):
+        player.soldiers = int(left)
+    # the order players ran out of soldiers is not stored, earlier seats are taken to have finished first
+    finished = np.where(soldiers == 0)[0]
+    game.power_level[finished] = n_player - np.arange(len(finished))
+    game.remain_player = n_player - len(finished)
+
+
+def label_state(task):
+    index, s, seat, playouts, done = task
+    game = worker['game']
+    set_state(game, s, seat)
+    Searcher.explore_opponents(game, seat)
+    searcher = Searcher(search_time=0, processes=0, max_playouts=playouts, rollout_policy=worker['rollout'])
+    # seeded by the state and the playouts it already has, so refining draws new playouts
+    res, counts = searcher.search(game, seat, 0, seed=[worker['seed'], index, done])
+    return index, res, counts
+
+
+def out_path(path):
+    return path[:-len('.npz')] + '.gt.npz' if path.endswith('.npz') else path + '.gt.npz'
+
+
+def load(path, out):
+    # input arrays with the gt and playouts of an earlier run of the same states
+    data = dict(np.load(path))
+    n_states = len(data['s'])
+    gt = np.zeros((n_states, 33), dtype=np.float32)
+    n = np.zeros((n_states, 33), dtype=np.uint32)
+    if os.path.exists(out):
+        labelled = np.load(out)
+        if len(labelled['s']) != n_states or not np.array_equal(labelled['s'], data['s']):
+            raise ValueError(f'{out} labels other states than {path}')
+        gt, n = labelled['gt'].astype(np.float32), labelled['n'].astype(np.uint32)
+    data['gt'] = gt
+    data['n'] = n
+    return data
+
+
+def save(out, data):
+    tmp = out + '.tmp.npz'
+    np.savez(tmp, **data)
+    os.replace(tmp, out)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', type=str, help='.npz with states s, adjacency matrices net and the seat of each state')
+    parser.add_argument('--seat', type=int, default=None, help='seat of every state when the file has no seat array')
+    parser.add_argument('--out', type=str, default=None, help='labelled .npz, default <path>.gt.npz')
+    parser.add_argument('--model', type=str, default='best')
+    parser.add_argument('--stage', type=int, default=0)
+    parser.add_argument('--playouts', type=int, default=500, help='playouts per action each state reaches')
+    parser.add_argument('--rollout', type=str, default='agent', choices=['agent', 'random'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--states', type=str, default=None, help='range of states, e.g. 0:10000')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--save_every', type=int, default=200)
+    parser.add_argument('--inference', action='store_true', help='batch all network calls in one inference process')
+    args = parser.parse_args()
+
+    mp.set_start_method('spawn', force=True)
+    out = args.out or out_path(args.path)
+    data = load(args.path, out)
+    s, gt, n = data['s'], data['gt'], data['n']
+    n_player = (s.shape[1] - 11) // 11
+    if 'seat' not in data:
+        if args.seat is None:
+            raise SystemExit(f'{args.path} has no seat array, the seat that saved the states is needed (--seat)')
+        data['seat'] = np.full(len(s), args.seat, dtype=np.int64)
+    seats = data['seat']
+    start, stop = 0, len(s)
+    if args.states is not None:
+        first, last = args.states.split(':')
+        start, stop = int(first or 0), min(int(last or len(s)), len(s))
+    done = n.min(axis=1)
+    todo, skipped = [], 0
+    for i in range(start, stop):
+        if done[i] >= args.playouts:
+            continue
+        if decode(s[i], int(seats[i]), n_player) is None:
+            skipped += 1  # the player to move has no soldiers left (or the counts are invalid)
+            continue
+        todo.append((i, s[i], int(seats[i]), args.playouts - int(done[i]), int(done[i])))
+    print(f'{len(todo)} states to label with {args.playouts} playouts per action, '
+          f'{stop - start - len(todo) - skipped} already in {out}, {skipped} skipped without a move to search')
+
+    t = time.time()
+    playouts = 0
+    server = None
+    if args.inference and args.rollout == 'agent':
+        model_config, model_name = resolve_model(args.model, args.stage, n_player)
+        server = InferenceServer([(model_name, model_config)], n_player)
+    initargs = (args.model, args.stage, n_player, args.rollout, args.seed, server.client if server else None)
+    with mp.Pool(processes=args.processes, initializer=init_worker, initargs=initargs) as pool:
+        for k, (i, res, counts) in enumerate(pool.imap_unordered(label_state, todo), 1):
+            total = n[i] + counts
+            gt[i] = (gt[i] * n[i] + res * counts) / np.maximum(total, 1)
+            n[i] = total
+            playouts += counts.sum()
+            if k % args.save_every == 0 or k == len(todo):
+                save(out, data)
+                elapsed = time.time() - t
+                print(f'{k}/{len(todo)} states, {k / elapsed * 3600:.0f} states per hour, '
+                      f'{playouts / elapsed:.0f} playouts per second')
+    if server is not None:
+        server.close()
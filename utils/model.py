@@ -17,14 +17,14 @@ class GCN(nn.Module):
     def forward(self, x, g):
         # x : [B, N, D]
         # g : [B, N, N]
-        for i in range(self.layers):
-            x = self.norm[i](x)
+        for norm, fc in zip(self.norm, self.fc):
+            x = norm(x)
             x_compute = torch.einsum('bnk,bkd->bnd', g, x)
-            x = self.fc[i](x_compute) + x
+            x = fc(x_compute) + x
         return x
 
 class Transformer_model(nn.Module):
-    def __init__(self, player_num, embed_dim=128, nlayers=2, gcn=1):
+    def __init__(self, player_num, embed_dim=128, nlayers=2, gcn=1, value_head=0):
         super().__init__()
         self.player_num = player_num
         self.nlayers = nlayers
@@ -37,9 +37,45 @@ class Transformer_model(nn.Module):
                                                   num_heads=8,
                                                   dropout=0.2) for _ in range(nlayers)])
         self.fc = nn.Linear(embed_dim * 11, 33, bias=False)
+        self.has_value = value_head == 1
+        self.value_fc = nn.Linear(embed_dim * 11, 1) if self.has_value else nn.Identity()
 
     def forward(self, state, net):
         cnt, net = self.process_feature(state, net)
+        return self.fc(self.encode(cnt, net)).squeeze()
+
+    def value(self, state, net):
+        cnt, net = self.process_feature(state, net)
+        return self.value_out(self.encode(cnt, net))
+
+    @torch.jit.export
+    def forward_static(self, state, static, net):
+        # state : [B, 11 * player_num] counts only, static / net from static_feature
+        return self.fc(self.encode_static(state, static, net)).squeeze()
+
+    @torch.jit.export
+    def value_static(self, state, static, net):
+        return self.value_out(self.encode_static(state, static, net))
+
+    @torch.jit.export
+    def static_feature(self, values, net):
+        # values : [11], net : [11, 11] with self loops, fixed for a whole game
+        net = (net - torch.eye(11, device=net.device)).unsqueeze(0)
+        static = torch.cat([(values / 7).reshape(1, 11, 1), net], dim=-1)
+        return static, net
+
+    def value_out(self, h):
+        # best action win rate of the player to move, normalized like the action outputs
+        if self.has_value:
+            return self.value_fc(h).squeeze(-1)
+        return torch.max(self.fc(h), dim=-1).values
+
+    def encode_static(self, state, static, net):
+        B = state.shape[0]
+        cnt = torch.cat([self.count_feature(state), static.expand(B, -1, -1)], dim=-1)
+        return self.encode(cnt, net.expand(B, -1, -1))
+
+    def encode(self, cnt, net):
         B = cnt.shape[0]
         h = self.embed(cnt)
         if self.nlayers == 0:
@@ -48,27 +84,27 @@ class Transformer_model(nn.Module):
         if self.use_gcn == 1:
             h = self.gcn(h, net)
 
-        for i in range(self.nlayers):
-            h = self.attn[i](h)
+        for attn in self.attn:
+            h = attn(h)
 
-        h = h.reshape(B, -1)
-        out = self.fc(h).squeeze()
-        return out
-
-    def process_feature(self, state, net):
-        if len(state.shape) == 2:
-            B = state.shape[0]
-        else:
-            state = state.unsqueeze(0)
-            B = 1
+        return h.reshape(B, -1)
 
-        cnt = state[:, :-11].reshape(B, 11, -1) / 18 * 11
+    def count_feature(self, state):
+        B = state.shape[0]
+        cnt = state.reshape(B, 11, -1) / 18 * 11
         empty = torch.sign(torch.sum(-cnt[:, :, :3], dim=-1, keepdim=True) + 1e-3)
         empty = (empty + 1) / 2
 
         diff_cnt = cnt[:, :, :1] - cnt[:, :, 1:]
+        return torch.cat([cnt, diff_cnt, empty], dim=-1)
+
+    def process_feature(self, state, net):
+        if len(state.shape) == 1:
+            state = state.unsqueeze(0)
+
+        cnt = self.count_feature(state[:, :-11])
         value = state[:, -11:] / 7
-        cnt = torch.cat([cnt, diff_cnt, empty, value.unsqueeze(-1)], dim=-1)
+        cnt = torch.cat([cnt, value.unsqueeze(-1)], dim=-1)
 
         if len(net.shape) == 2:
             net = net.unsqueeze(0)
@@ -0,0 +1,38 @@
+import os
+import pickle
+import torch
+from utils.frozen import load_frozen
+
+
+# One eval-mode model per (checkpoint, device) in each process, shared by every player using it.
+_models = {}
+remote = {}  # checkpoint -> RemoteModel in processes connected to an inference server
+
+
+def load_state(path, device):
+    # memory-map the checkpoint so weights are paged in instead of read into a buffer first
+    try:
+        return torch.load(path, map_location=device, mmap=True, weights_only=True)
+    except (TypeError, RuntimeError, pickle.UnpicklingError):  # older torch or legacy checkpoint format
+        return torch.load(path, map_location=device)
+
+
+def load_model(model_path, model_config, player_num, device='cpu'):
+    if model_path is not None and os.path.abspath(model_path) in remote:
+        return remote[os.path.abspath(model_path)]
+    if model_path is not None and model_path.endswith('.pt'):
+        return load_frozen(model_path, device)
+    key = (os.path.abspath(model_path), str(device)) if model_path is not None else None
+    if key not in _models:
+        from utils.model import Transformer_model
+        model = Transformer_model(player_num=player_num,
+                                  embed_dim=model_config["embed_dim"],
+                                  nlayers=model_config["nlayer"],
+                                  gcn=model_config["gcn"],
+                                  value_head=int(model_config.get("value_head", 0) == 1)).to(device)
+        if model_path is None:
+            return model  # untrained network, not shared
+        model.load_state_dict(load_state(model_path, device))
+        model.eval()
+        _models[key] = model
+    return _models[key]
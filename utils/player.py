@@ -1,21 +1,28 @@
 import numpy as np
 import torch
-from utils.model import Transformer_model
+from copy import deepcopy
+from utils.model_cache import load_model
+from utils.game import RandomStream, encode_state
+from utils import profiler
 
 class Player:
-    def __init__(self, player_type, model_config=None, player_num=3, player_id=0, log_file=None):
+    def __init__(self, player_type, model_config=None, player_num=3, player_id=0, log_file=None, model_path=None):
         self.soldiers = 18
         self.id = player_id
         self.player_type = player_type
         self.log_file = log_file
         self.player_num = player_num
+        self.static = None
+        self.stream = RandomStream()
+        self.model_path = model_path
+        self.model_config = model_config
+        self.model = None  # Manual players have no model of their own
         if self.player_type == 'agent' or self.player_type == 'manual':
             self.epsilon = 0.2
             self.random = False
-            self.model = Transformer_model(player_num=player_num,
-                                           embed_dim=model_config["embed_dim"],
-                                           nlayers=model_config["nlayer"],
-                                           gcn=model_config["gcn"]).cuda()
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            if self.player_type == 'agent':
+                self.model = load_model(model_path, model_config, player_num, self.device)
             self.buffer_s = []
             self.threshold = 0.6
             self.all_prob = []
@@ -32,22 +39,20 @@ class Player:
 
         if self.player_type == 'random':
             action_space = 33 if dice == 0 else 3
-            return np.random.randint(action_space), False
+            return self.stream.rng.integers(action_space), False
 
         elif self.player_type == 'agent':
-            s = torch.from_numpy(state).cuda().float().reshape(-1, 11)
-            indices = [self.id] + [i for i in range(self.player_num) if i != self.id]
-            s = s[indices].reshape(-1)
-
-            v = torch.from_numpy(values).cuda().float()
-            network = torch.from_numpy(net + np.eye(11)).cuda().float()
-            self.buffer_s.append(torch.cat([s.cpu(), v.cpu()]).numpy())
+            with profiler.span('player.features'):
+                s = encode_state(state, self.id)
+                self.buffer_s.append(np.concatenate([s, values]).astype(np.float32))
+                s = torch.from_numpy(s).to(self.device).float().unsqueeze(0)
+                self.check_static(net, values)
 
             if dice == 1:
                 ops = [int(v2p[options[i, 0]] * 3 + min(options[i, 1], self.soldiers - 1)) for i in range(3)]
 
-                if self.random and np.random.rand() < self.epsilon:
-                    action = np.random.randint(3)
+                if self.random and self.stream.rng.random() < self.epsilon:
+                    action = self.stream.rng.integers(3)
 
                 if by_serach:
                     action = np.argmax(search_result[ops])
@@ -58,16 +63,16 @@ class Player:
 
                     return action, reroll
 
-                with torch.no_grad():
-                    out = self.model(torch.cat([s, v], dim=-1), network).cpu().numpy() / 4 + 1 / self.player_num
+                with torch.no_grad(), profiler.span('player.forward'):
+                    out = self.model.forward_static(s, *self.static).cpu().numpy() / 4 + 1 / self.player_num
                 reroll, thresh = self.check_reroll(out, ops, policy=False)
                 action = np.argmax(out[ops])
 
                 return action, reroll
             
             else:
-                if self.random and np.random.rand() < self.epsilon:
-                    action = np.random.randint(33)
+                if self.random and self.stream.rng.random() < self.epsilon:
+                    action = self.stream.rng.integers(33)
                     if by_serach and verbose:
                         print(f"Player {self.id + 1} : Use random, Max win rate : {np.max(search_result):.3f}, Chosen win rate : {search_result[action]:.3f}")
                     return action, False
@@ -79,8 +84,8 @@ class Player:
 
                     return action, False
 
-                with torch.no_grad():   
-                    out = self.model(torch.cat([s, v], dim=-1), network).cpu().numpy()
+                with torch.no_grad(), profiler.span('player.forward'):
+                    out = self.model.forward_static(s, *self.static).cpu().numpy()
                 action = np.argmax(out)
 
                 return action, False
@@ -102,8 +107,60 @@ class Player:
                 action = v2p[action[0] - 2] * 3 + action[1] - 1
                 return action, False
 
+    def __getstate__(self):
+        # checkpoints are reloaded through the per-process cache instead of being pickled
+        state = self.__dict__.copy()
+        if self.model is not None and self.model_path is not None:
+            state['model'] = self.model_path
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if isinstance(self.model, str):
+            self.model = load_model(self.model, self.model_config, self.player_num, self.device)
+
+    def __deepcopy__(self, memo):
+        # the model is only read during play, so copies share it
+        player = Player.__new__(Player)
+        memo[id(self)] = player
+        for k, v in self.__dict__.items():
+            player.__dict__[k] = v if k == 'model' else deepcopy(v, memo)
+        return player
+
+    def share_model(self, player):
+        self.model = player.model
+        self.model_path = player.model_path
+        self.model_config = player.model_config
+
+    def evaluate(self, state, net, values):
+        self.check_static(net, values)
+        s = torch.from_numpy(encode_state(state, self.id).reshape(1, -1)).to(self.device).float()
+        with torch.no_grad():
+            out = self.model.forward_static(s, *self.static).cpu().numpy()
+        return out / 4 + 1 / self.player_num
+
+    def judge(self, state, net, values):
+        self.check_static(net, values)
+        s = []
+        for p in range(self.player_num):
+            s.append(encode_state(state, p))
+        s = torch.from_numpy(np.array(s)).to(self.device).float()
+
+        with torch.no_grad():
+            out = self.model.value_static(s, *self.static).cpu().numpy() / 4 + 1 / self.player_num
+        out = np.clip(out, 1e-3, None)
+        return out / np.sum(out)
+
+    def check_static(self, net, values):
+        if self.static is None:
+            v = torch.from_numpy(values).to(self.device).float()
+            network = torch.from_numpy(net + np.eye(11)).to(self.device).float()
+            with torch.no_grad():
+                self.static = self.model.static_feature(v, network)
+
     def reset(self):
         self.soldiers = 18
+        self.static = None
         self.clear_buffer()
         
 
@@ -0,0 +1,98 @@
+import atexit
+import json
+import os
+import threading
+import time
+import multiprocessing as mp
+
+# Opt-in timing spans for the engine, players and search.
+# RN_PROFILE=<trace.json> enables them and writes a Chrome trace at exit.
+enabled = False
+events = []
+
+
+class Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        events.append((self.name, os.getpid(), threading.get_ident(), self.start, time.perf_counter() - self.start))
+        return False
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+null_span = NullSpan()
+
+
+def span(name):
+    if not enabled:
+        return null_span
+    return Span(name)
+
+
+def enable(out=None):
+    global enabled
+    enabled = True
+    if out is not None:
+        atexit.register(lambda: export(out))
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def drain():
+    # hand this process's events to the caller, e.g. from a pool worker
+    global events
+    res, events = events, []
+    return res
+
+
+def merge(worker_events):
+    events.extend(worker_events)
+
+
+def export(path, trace_events=None):
+    if trace_events is None:
+        trace_events = events
+    if len(trace_events) == 0:
+        return
+    t0 = min(e[3] for e in trace_events)
+    trace = [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+              'ts': (start - t0) * 1e6, 'dur': dur * 1e6} for name, pid, tid, start, dur in trace_events]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+    print(summary(trace_events))
+
+
+def summary(trace_events=None):
+    if trace_events is None:
+        trace_events = events
+    stats = {}
+    for name, pid, tid, start, dur in trace_events:
+        count, total = stats.get(name, (0, 0.0))
+        stats[name] = (count + 1, total + dur)
+
+    lines = [f'{"phase":<24}{"count":>10}{"total s":>12}{"mean us":>12}{"processes":>11}']
+    for name, (count, total) in sorted(stats.items(), key=lambda x: -x[1][1]):
+        processes = len(set(e[1] for e in trace_events if e[0] == name))
+        lines.append(f'{name:<24}{count:>10}{total:>12.3f}{total / count * 1e6:>12.1f}{processes:>11}')
+    return '\n'.join(lines)
+
+
+if os.environ.get('RN_PROFILE'):
+    enable(os.environ['RN_PROFILE'] if mp.current_process().name == 'MainProcess' else None)
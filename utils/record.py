@@ -0,0 +1,238 @@
+import argparse
+import mmap
+import os
+import struct
+import numpy as np
+
+
+# A record file holds games back to back after an 8 byte magic, each game is
+#   header: n_players (u1), dice mode (u1), moves (u2), seed (i8, -1 unknown), region values (11 x u1)
+#   moves:  MOVE rows
+# and <path>.idx holds the u8 offset of every game, so game i is one seek away.
+MAGIC = b'RNREC1\0\0'
+HEADER = struct.Struct('<BBHq11s')
+MOVE = np.dtype([('player', 'u1'), ('dice', 'u1'), ('reroll', 'u1'), ('option', 'u1'), ('action', 'u1'),
+                 ('playouts', '<u4'), ('winrate', '<f2')])
+NONE = 255  # no roll, no reroll or no option
+
+
+def dice_index(dice):
+    return dice[0] * 36 + dice[1] * 6 + dice[2]
+
+
+def dice_values(index):
+    return [index // 36, index // 6 % 6, index % 6]
+
+
+def dice_options(index):
+    # (value - 2, soldiers - 1) of the three options, as Game.roll_dice
+    d = dice_values(index)
+    return [(d[0] + d[1], d[2] // 2), (d[0] + d[2], d[1] // 2), (d[2] + d[1], d[0] // 2)]
+
+
+class GameRecord:
+    def __init__(self, n_players, values, seed=None, dice=1, moves=None):
+        self.n_players = n_players
+        self.values = np.asarray(values, dtype=np.uint8)
+        self.seed = seed
+        self.dice = dice
+        self.moves = [] if moves is None else moves  # MOVE tuples, or a MOVE array once read back
+
+    @classmethod
+    def start(cls, game, seed=None):
+        return cls(game.player_num, game.values, seed=seed, dice=game.dice)
+
+    def add(self, game, player_id, action, option=None, playouts=0, winrate=np.nan):
+        # call right after the move, the game still holds the dice of the turn
+        rolled = [dice_index(d) for d in game.rolled[:2]] if game.dice == 1 else []
+        dice = rolled[0] if rolled else NONE
+        reroll = rolled[1] if len(rolled) > 1 else NONE
+        if option is None:
+            option = self.find_option(game, rolled[-1], action) if rolled else NONE
+        self.moves.append((player_id, dice, reroll, option, action, min(int(playouts), 2 ** 32 - 1), winrate))
+
+    @staticmethod
+    def find_option(game, dice, action):
+        # the option played, the searcher caps soldiers at the ones left
+        options = [game.v2p[v] * 3 + s for v, s in dice_options(dice)]
+        if action in options:
+            return options.index(action)
+        for i, a in enumerate(options):
+            if a // 3 == action // 3 and a % 3 > action % 3:
+                return i
+        return NONE
+
+    def to_bytes(self):
+        moves = np.array(self.moves, dtype=MOVE)
+        seed = -1 if self.seed is None else self.seed
+        return HEADER.pack(self.n_players, self.dice, len(moves), seed, self.values.tobytes()) + moves.tobytes()
+
+    @classmethod
+    def from_buffer(cls, buf, offset=0):
+        n_players, dice, n_moves, seed, values = HEADER.unpack_from(buf, offset)
+        moves = np.frombuffer(buf, dtype=MOVE, count=n_moves, offset=offset + HEADER.size).copy()
+        return cls(n_players, np.frombuffer(values, dtype=np.uint8), None if seed == -1 else seed, dice, moves)
+
+    @staticmethod
+    def size(buf, offset):
+        return HEADER.size + HEADER.unpack_from(buf, offset)[2] * MOVE.itemsize
+
+    def replay(self, upto=None, players=None):
+        # board after the first `upto` moves (all by default), players default to manual seats
+        from utils.game import Game
+        if players is None:
+            from utils.player import Player
+            players = [Player('manual', None, self.n_players, i) for i in range(self.n_players)]
+        game = Game(players, dice=self.dice)
+        game.set_values(self.values.astype(int))
+        moves = self.moves[:upto] if upto is not None else self.moves
+        for move in np.asarray(moves, dtype=MOVE):
+            game.apply(int(move['player']), int(move['action']))
+        return game
+
+    def scores(self):
+        return self.replay().get_current_score()
+
+
+class RecordWriter:
+    # Appends games to a record file; a game is indexed only after its bytes are written,
+    # and opening a file drops a partly written last game.
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.repair()
+        self.data = open(path, 'ab')
+        self.index = open(self.index_path, 'ab')
+        if self.data.tell() == 0:
+            self.data.write(MAGIC)
+        self.offset = self.data.tell()
+
+    def repair(self):
+        if not os.path.exists(self.path):
+            open(self.index_path, 'wb').close()
+            return
+        if not os.path.exists(self.index_path):
+            scan(self.path).tofile(self.index_path)
+        offsets = read_index(self.index_path)
+        size = os.path.getsize(self.path)
+        end = len(MAGIC)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) not in (MAGIC, b''):
+                raise ValueError(f'{self.path} is not a game record file')
+            n = len(offsets)
+            while n > 0:
+                f.seek(offsets[n - 1])
+                head = f.read(HEADER.size)
+                if len(head) == HEADER.size:
+                    last = offsets[n - 1] + HEADER.size + HEADER.unpack(head)[2] * MOVE.itemsize
+                    if last <= size:
+                        end = last
+                        break
+                n -= 1
+        if n < len(offsets):
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(n * 8)
+        if size > end:
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+
+    def append(self, record):
+        data = record if isinstance(record, bytes) else record.to_bytes()
+        self.data.write(data)
+        self.index.write(struct.pack('<Q', self.offset))
+        self.offset += len(data)
+
+    def flush(self):
+        self.data.flush()
+        self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_index(path):
+    try:
+        return np.fromfile(path, dtype='<u8')
+    except FileNotFoundError:
+        return np.zeros(0, dtype='<u8')
+
+
+def scan(path):
+    # offsets of the complete games, to rebuild a lost index
+    with open(path, 'rb') as f:
+        buf = f.read()
+    offsets = []
+    offset = len(MAGIC)
+    while offset + HEADER.size <= len(buf) and offset + GameRecord.size(buf, offset) <= len(buf):
+        offsets.append(offset)
+        offset += GameRecord.size(buf, offset)
+    return np.array(offsets, dtype='<u8')
+
+
+class RecordReader:
+    # Random access to the games of a record file through its index
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+        self.offsets = read_index(path + '.idx')
+        # a writer may be appending, only games whose bytes are all there count
+        while len(self.offsets) and not self.complete(int(self.offsets[-1])):
+            self.offsets = self.offsets[:-1]
+
+    def complete(self, offset):
+        return offset + HEADER.size <= len(self.buf) and offset + GameRecord.size(self.buf, offset) <= len(self.buf)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        return GameRecord.from_buffer(self.buf, int(self.offsets[i]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', type=str)
+    parser.add_argument('--game', type=int, default=None, help='replay one game move by move')
+    args = parser.parse_args()
+
+    with RecordReader(args.path) as reader:
+        if args.game is None:
+            moves = sum(len(r.moves) for r in reader)
+            print(f'{len(reader)} games, {moves} moves, {os.path.getsize(args.path) / 1e6:.1f}MB')
+        else:
+            record = reader[args.game]
+            print(f'seed {record.seed}, region values {record.values.tolist()}')
+            game = record.replay(upto=0)
+            for move in record.moves:
+                soldiers = game.apply(int(move['player']), int(move['action']))
+                rolls = [[d + 1 for d in dice_values(int(move[k]))] for k in ('dice', 'reroll') if move[k] != NONE]
+                stats = f', {move["playouts"]} playouts, win rate {move["winrate"]:.3f}' if move['playouts'] else ''
+                print(f'player {move["player"]} rolls {rolls} deploys {soldiers} to region '
+                      f'{game.values[move["action"] // 3]}{stats}')
+            print('scores', game.get_current_score().tolist())
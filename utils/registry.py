@@ -0,0 +1,193 @@
+import argparse
+import bisect
+import csv
+import glob
+import json
+import os
+
+ROOT = './model_offline'
+INDEX = 'index.json'
+VERSION = 2
+
+
+def read_args(model_dir):
+    with open(os.path.join(model_dir, 'args.csv')) as f:
+        row = next(csv.DictReader(f))
+    return {k: parse_value(v) for k, v in row.items()}
+
+
+def parse_value(text):
+    # numbers as int or float (1e-05 included), anything else (True, names) stays a string
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def file_stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime]
+
+
+class Registry:
+    # Index of training runs under model_offline/<stage>-<n>/<run>/, kept in model_offline/index.json.
+    # Runs are re-read only when their args.csv changes and each group stays sorted by test_loss.
+    # After the first scan a group is only rescanned when its directory's mtime changes (a run was
+    # added or removed); runs rewritten in place are picked up by register() or a new Registry.
+
+    def __init__(self, root=ROOT):
+        self.root = root
+        self.path = os.path.join(root, INDEX)
+        self.groups = {}  # 'stage-n' -> {'mtime': dir mtime, 'runs': [run, ...] sorted by test_loss}
+        self.dirty = False
+        self.arg_indexes = {}  # 'stage-n' -> {(arg, value): runs sorted by test_loss}, built on first query
+        self.load()
+        self.update(full=True)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if index.get('version') == VERSION:
+            self.groups = index['groups']
+            self.arg_indexes = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'version': VERSION, 'groups': self.groups}, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError:
+            return  # read-only model directory, the in-memory index still works
+        self.dirty = False
+
+    def entry(self, group, model_dir):
+        run_dir = os.path.join(self.root, group, model_dir)
+        args = read_args(run_dir)
+        return {'model_dir': model_dir, 'args': args, 'test_loss': args.get('test_loss', float('inf')),
+                'args_stat': file_stat(os.path.join(run_dir, 'args.csv')),
+                'checkpoint': file_stat(os.path.join(run_dir, 'best_model.pth'))}
+
+    def add(self, group, run):
+        runs = self.groups.setdefault(group, {'mtime': None, 'runs': []})['runs']
+        runs[:] = [r for r in runs if r['model_dir'] != run['model_dir']]
+        keys = [r['test_loss'] for r in runs]
+        runs.insert(bisect.bisect_right(keys, run['test_loss']), run)
+        self.arg_indexes.pop(group, None)
+        self.dirty = True
+
+    def update(self, full=False):
+        # new runs change the group directory's mtime; a full update also checks every known run's
+        # args.csv and checkpoint stat
+        if not os.path.isdir(self.root):
+            return
+        for group in list(self.groups):
+            if not os.path.isdir(os.path.join(self.root, group)):
+                del self.groups[group]
+                self.arg_indexes.pop(group, None)
+                self.dirty = True
+        for group_dir in glob.glob(os.path.join(self.root, '*-*')):
+            group = os.path.basename(group_dir)
+            mtime = os.stat(group_dir).st_mtime
+            known = self.groups.get(group, {'mtime': None, 'runs': []})
+            if mtime == known['mtime'] and not full:
+                continue
+            runs = {r['model_dir']: r for r in known['runs']}
+            if mtime != known['mtime']:
+                for args_path in glob.glob(os.path.join(group_dir, '*', 'args.csv')):
+                    runs.setdefault(os.path.basename(os.path.dirname(args_path)), None)
+            for model_dir, run in runs.items():
+                self.refresh(group, model_dir, run)
+            if group in self.groups and self.groups[group]['mtime'] != mtime:
+                self.groups[group]['mtime'] = mtime
+                self.dirty = True
+        self.save()
+
+    def refresh(self, group, model_dir, run):
+        run_dir = os.path.join(self.root, group, model_dir)
+        args_stat = file_stat(os.path.join(run_dir, 'args.csv'))
+        if args_stat is None:
+            if run is not None:
+                self.groups[group]['runs'].remove(run)
+                self.arg_indexes.pop(group, None)
+                self.dirty = True
+        elif run is None or run['args_stat'] != args_stat:
+            self.add(group, self.entry(group, model_dir))
+        else:
+            checkpoint = file_stat(os.path.join(run_dir, 'best_model.pth'))
+            if checkpoint != run['checkpoint']:
+                run['checkpoint'] = checkpoint
+                self.dirty = True
+
+    def register(self, run_dir):
+        # add or refresh one run right after training writes it
+        group = os.path.basename(os.path.dirname(os.path.normpath(run_dir)))
+        self.add(group, self.entry(group, os.path.basename(os.path.normpath(run_dir))))
+        self.save()
+
+    def arg_index(self, group):
+        # runs of a group by (arg, value), each list sorted by test_loss like the group
+        if group not in self.arg_indexes:
+            index = {}
+            for run in self.groups.get(group, {'runs': []})['runs']:
+                for item in run['args'].items():
+                    index.setdefault(item, []).append(run)
+            self.arg_indexes[group] = index
+        return self.arg_indexes[group]
+
+    def matching(self, stage, n_player, filters):
+        # runs in test_loss order whose args match every filter, drawn from the rarest filter's list
+        group = f'{stage}-{n_player}'
+        if not filters:
+            return iter(self.groups.get(group, {'runs': []})['runs'])
+        index = self.arg_index(group)
+        candidates = min((index.get(item, []) for item in filters.items()), key=len)
+        return (r for r in candidates if all(r['args'].get(k) == v for k, v in filters.items()))
+
+    def runs(self, stage, n_player, **filters):
+        # runs sorted by test_loss whose args match every filter
+        return list(self.matching(stage, n_player, filters))
+
+    def best(self, stage, n_player, **filters):
+        return next(self.matching(stage, n_player, filters), None)
+
+    def checkpoint(self, stage, n_player, run):
+        return os.path.join(self.root, f'{stage}-{n_player}', run['model_dir'], 'best_model.pth')
+
+
+_registry = None
+
+
+def get_registry():
+    # one registry per process, groups whose directory changed are rescanned on every call
+    global _registry
+    if _registry is None:
+        _registry = Registry()
+    else:
+        _registry.update()
+    return _registry
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stage', type=int, default=0)
+    parser.add_argument('--n_player', type=int, default=3)
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(os.path.join(ROOT, INDEX)):
+        os.remove(os.path.join(ROOT, INDEX))
+    registry = Registry()
+    for run in registry.runs(args.stage, args.n_player):
+        size = f'{run["checkpoint"][0] / 1e6:.1f}MB' if run['checkpoint'] else 'no checkpoint'
+        print(f'{run["model_dir"]} test_loss {run["test_loss"]:.4f} {size} {run["args"]}')
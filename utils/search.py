@@ -0,0 +1,405 @@
+import math
+import os
+import pickle
+import time
+import multiprocessing as mp
+from contextlib import nullcontext
+from copy import deepcopy
+from functools import partial
+import numpy as np
+from utils.game import RandomStream, dice_sequence, dice_outcome
+from utils.time_manager import TimeManager
+from utils.shared_state import SharedBoard, shareable, load_board, write_result
+from utils import profiler
+
+
+class Searcher:
+    """Root-parallel playout search shared by the UI controller and headless tools."""
+
+    def __init__(self, search_time=8.0, processes=5, dice_sampling='independent', max_playouts=None,
+                 rollout_policy='agent', adaptive_time=False, n_players=3, reroll_margin=0.0, pool=None):
+        self.search_time = search_time
+        self.processes = processes  # 0 runs every task in this process
+        self.dice_sampling = dice_sampling  # 'independent', 'common' or 'stratified' dice across actions
+        self.max_playouts = max_playouts  # Fixed playouts per search task instead of search_time (reproducible)
+        self.rollout_policy = rollout_policy  # Player type used for all seats in playouts ('agent' or 'random')
+        self.time_manager = TimeManager(search_time, n_players) if adaptive_time else None
+        self.reroll_margin = reroll_margin  # Expected gain a fresh roll needs before rerolling
+        self.last_variance_reduction = None  # Variance reduction of the last common dice search
+        self.last_winrate = np.nan  # Searched win rate of the action last chosen (nan when nothing was searched)
+        self.model_player = None  # Lends its model to seats without one (judge and playouts)
+        self.shared_pool = pool  # Long-lived pool shared with other searchers instead of a pool per search
+        self.inference = None  # InferenceClient running the network for the pool workers' playouts
+        self.shared_memory = True  # Send pool workers the board and collect their results through shared memory
+        self.remote = None  # Coordinator running searches on worker hosts instead of the local pool
+        self.book = None  # OpeningBook answering the first move without a search
+        self.cache = None  # EvalCache merging search and judge playouts with those of earlier sessions
+
+    def new_pool(self):
+        if self.inference is None:
+            return mp.Pool(processes=self.processes)
+        from utils.inference import connect
+        return mp.Pool(processes=self.processes, initializer=connect, initargs=(self.inference,))
+
+    def pool(self):
+        if self.shared_pool is not None:
+            return nullcontext(self.shared_pool)
+        if self.processes == 0:
+            return nullcontext()
+        return self.new_pool()
+
+    def run(self, func, args, pool=None):
+        pool = pool or self.shared_pool
+        if pool is not None:
+            return pool.starmap(func, args)
+        if self.processes == 0:
+            return [func(*a) for a in args]
+        with self.new_pool() as pool:
+            return pool.starmap(func, args)
+
+    @staticmethod
+    def simulate(game, player_id, search_time, action, seed=None, crn_seed=None, stratify=False, max_playouts=None, policy='agent', profile=False):
+        """Simulate game for search, for search_time seconds or exactly max_playouts playouts."""
+        previous = profiler.enabled  # pool workers outlive the call, other tasks must not inherit spans
+        if profile:
+            profiler.enable()
+        try:
+            points = []
+            cnt = 0
+            t1 = time.time()
+            n_players = game.player_num
+            stream = RandomStream(np.random.default_rng(seed))
+            if crn_seed is not None:
+                strata = np.array([np.random.default_rng([crn_seed, i]).permutation(216) for i in range(n_players)])
+            while True:
+                with profiler.span('simulate.deepcopy'):
+                    game_sim = deepcopy(game)
+                game_sim.set_stream(stream)
+                for i in range(n_players):
+                    game_sim.players[i].player_type = policy
+                
+                if action != -1:
+                    game_sim.step(player_id, action)
+                idx = (player_id + 1) % n_players
+                
+                if crn_seed is not None:
+                    # Playout cnt sees the same dice whichever action was taken
+                    game_sim.set_rng(np.random.default_rng([crn_seed, cnt, 1]))
+                    game_sim.dice_seq = dice_sequence([crn_seed, cnt], n_players)
+                    if stratify:
+                        for i in range(n_players):
+                            if game_sim.moves[i] < 18:
+                                game_sim.dice_seq[i, game_sim.moves[i], 0] = dice_outcome(strata[i, cnt % 216])
+                
+                with profiler.span('simulate.playout'):
+                    while True:
+                        with profiler.span('game.step'):
+                            game_sim.step(idx)
+                        idx = (idx + 1) % n_players
+                        flag = game_sim.terminal()
+                        if flag:
+                            break
+                with profiler.span('game.score'):
+                    score = game_sim.get_current_score()
+                points.append(score)
+                cnt += 1
+                t = time.time()
+                if max_playouts is not None:
+                    if cnt >= max_playouts:
+                        break
+                elif (t - t1) >= search_time:
+                    break
+            return np.array(points), cnt, profiler.drain()
+        finally:
+            if not previous:
+                profiler.disable()
+    
+    @staticmethod
+    def simulate_shared(spec, names, player_id, search_time, task, action, seed=None, max_playouts=None, policy='agent', profile=False):
+        """Simulate the shared board and write the aggregated result of this task into the shared result rows."""
+        game = load_board(spec, names[0])
+        points, cnt, events = Searcher.simulate(game, player_id, search_time, action, seed=seed,
+                                                max_playouts=max_playouts, policy=policy, profile=profile)
+        write_result(names[1], task, game.player_num, points)
+        return events
+    
+    def run_shared(self, game, player_id, search_time, actions, seeds, pool=None, **kwargs):
+        """Run one task per action through shared memory, returning playouts and wins per player for each task."""
+        with SharedBoard(game, len(actions)) as board:
+            func = partial(Searcher.simulate_shared, board.spec, board.names, player_id, search_time, **kwargs)
+            for events in self.run(func, list(zip(range(len(actions)), actions, seeds)), pool):
+                profiler.merge(events)
+            results = board.results.copy()
+        return results[:, 0], results[:, 1:1 + game.player_num]
+    
+    def use_shared(self, game, pool=None):
+        return self.shared_memory and (pool is not None or self.shared_pool is not None or self.processes > 0) and shareable(game)
+    
+    def with_models(self, game):
+        """Copy of game where manual seats borrow the shared model, as playouts run every seat with a policy."""
+        if self.model_player is None or all(p.model is not None for p in game.players):
+            return game
+        game = deepcopy(game)
+        for p in game.players:
+            if p.model is None:
+                p.share_model(self.model_player)
+        return game
+    
+    @staticmethod
+    def next_seed(game):
+        """Draw a search seed from the game's generator."""
+        return int(game.stream.rng.integers(2**63))
+    
+    def cache_config(self, game):
+        """Playout setup in the cache key: the rollout policy and the network and exploration of every seat."""
+        if self.rollout_policy == 'random':
+            return 'random'
+        seats = []
+        for p in game.players:
+            path = p.model_path if p.model is not None else getattr(self.model_player, 'model_path', None)
+            seats.append(f'{os.path.abspath(path) if path else None}:{p.epsilon}:{p.random}')
+        return ' '.join([self.rollout_policy] + seats)
+    
+    def cache_lookup(self, game, player_id, kind, items):
+        """Cache key, slots and cached wins and playouts of actions ('search') or players ('judge')."""
+        key, sym = self.cache.position(game, player_id, kind, self.cache_config(game))
+        slots = self.cache.slots(sym, items) if kind == 'search' else list(items)
+        wins, counts = self.cache.get(key, slots)
+        return key, slots, wins, counts
+    
+    def search(self, game, player_id, search_time, seed=None, pool=None, actions=None):
+        """Search for best action among actions (all 33 by default), merged with the cached playouts."""
+        if actions is None:
+            actions = list(range(33))
+        if self.cache is None:
+            return self.playout_search(game, player_id, search_time, seed, pool, actions)
+        
+        key, slots, wins, counts = self.cache_lookup(game, player_id, 'search', actions)
+        if counts.min() < self.cache.enough:
+            res, n = self.playout_search(game, player_id, search_time, seed, pool, actions)
+            new_wins, new_counts = res[actions] * n[actions], n[actions]
+            self.cache.add(key, slots, new_wins, new_counts)
+            wins, counts = wins + new_wins, counts + new_counts
+        res = np.zeros(33)
+        search_times = np.zeros(33, dtype=int)
+        res[actions] = wins / np.maximum(counts, 1)
+        search_times[actions] = counts
+        return res, search_times
+    
+    def playout_search(self, game, player_id, search_time, seed, pool, actions, remote=True):
+        """Win rates of actions from new playouts only."""
+        # Split each action over several tasks when there are fewer actions than processes
+        chunks = max(self.processes // len(actions), 1)
+        seeds = np.random.SeedSequence(seed)
+        kwargs = {'max_playouts': self.max_playouts, 'policy': self.rollout_policy}
+        crn_seeds = [None] * chunks
+        if self.dice_sampling != 'independent':
+            crn_seeds = [int(s) for s in seeds.generate_state(chunks)]
+            kwargs['stratify'] = self.dice_sampling == 'stratified'
+        
+        if profiler.enabled:
+            kwargs['profile'] = True
+            with profiler.span('search.pickle'):
+                pickle.dumps(game)
+        
+        tasks = [(a, c) for c in range(chunks) for a in actions]
+        game = self.with_models(game)
+        self.last_variance_reduction = None
+        if crn_seeds[0] is None and self.remote is not None and remote:
+            with profiler.span('search.remote'):
+                res, search_times = self.remote.search(game, player_id, search_time, seed=seed, actions=actions,
+                                                       max_playouts=self.max_playouts, policy=self.rollout_policy)
+            missing = [a for a in actions if search_times[a] == 0]
+            if missing:
+                # Actions no worker finished are searched here rather than ranked without playouts
+                local, local_times = self.playout_search(game, player_id, search_time, seed, pool, missing, remote=False)
+                res[missing], search_times[missing] = local[missing], local_times[missing]
+            return res, search_times
+        if crn_seeds[0] is None and self.use_shared(game, pool):
+            # Independent dice need only the win counts, not every playout
+            with profiler.span('search.pool'):
+                cnt, wins = self.run_shared(game, player_id, search_time, [a for a, c in tasks],
+                                            seeds.spawn(len(tasks)), pool, **kwargs)
+            res = np.zeros(33)
+            search_times = np.zeros(33, dtype=int)
+            for (a, c), n, w in zip(tasks, cnt, wins[:, player_id]):
+                res[a] += w
+                search_times[a] += n
+            res[actions] /= search_times[actions]
+            return res, search_times
+        
+        func = partial(Searcher.simulate, game, player_id, search_time, **kwargs)
+        args = [(a, s, crn_seeds[c]) for (a, c), s in zip(tasks, seeds.spawn(len(tasks)))]
+        with profiler.span('search.pool'):
+            result = self.run(func, args, pool)
+        
+        sim_points = {}
+        for task, (points, cnt, events) in zip(tasks, result):
+            sim_points[task] = points
+            profiler.merge(events)
+        if crn_seeds[0] is not None:
+            # Only playouts shared by every action are paired
+            for c in range(chunks):
+                common = min(len(sim_points[(a, c)]) for a in actions)
+                for a in actions:
+                    sim_points[(a, c)] = sim_points[(a, c)][:common]
+        
+        res = np.zeros(33)
+        search_times = np.zeros(33, dtype=int)
+        points_per_action = []
+        for a in actions:
+            points = np.concatenate([sim_points[(a, c)] for c in range(chunks)], axis=0)
+            rank = np.argsort(points, axis=1)[:, -1]
+            res[a] = np.where(rank == player_id)[0].shape[0] / rank.shape[0]
+            search_times[a] = rank.shape[0]
+            points_per_action.append(points)
+        
+        if crn_seeds[0] is not None and len(actions) > 1:
+            self.last_variance_reduction = self.variance_reduction(points_per_action, player_id)
+        
+        return res, search_times
+    
+    def managed_search(self, game, player_id, actions):
+        """Search within the time manager's budget, stopping once the decision is clear."""
+        budget = self.time_manager.allocate(game, player_id)
+        n_tasks = max(self.processes // len(actions), 1) * len(actions)
+        waves = math.ceil(n_tasks / max(self.processes, 1))  # rounds of pool tasks per search
+        slice_time = self.time_manager.slice_time(player_id, budget, waves)
+        
+        wins = np.zeros(33)
+        counts = np.zeros(33)
+        if self.cache is not None:
+            # cached playouts count towards a clear decision, only new ones are stored
+            key, slots, wins[actions], counts[actions] = self.cache_lookup(game, player_id, 'search', actions)
+            if counts[actions].min() >= self.cache.enough:
+                return wins / np.maximum(counts, 1), counts.astype(int)
+        prior_wins, prior_counts = wins.copy(), counts.copy()
+        start = time.time()
+        with self.pool() as pool:
+            while True:
+                res, n = self.playout_search(game, player_id, slice_time, self.next_seed(game), pool, actions)
+                wins += res * n
+                counts += n
+                winrate = np.divide(wins, counts, out=np.zeros(33), where=counts > 0)
+                elapsed = time.time() - start
+                if elapsed + waves * slice_time > budget or self.time_manager.is_clear(winrate, counts, actions):
+                    break
+        
+        if self.cache is not None:
+            self.cache.add(key, slots, (wins - prior_wins)[actions], (counts - prior_counts)[actions])
+        self.time_manager.spend(player_id, elapsed, (counts - prior_counts).sum(), len(actions))
+        return winrate, counts.astype(int)
+    
+    def search_options(self, game, player_id, options):
+        """Search only the distinct actions offered by the rolled options."""
+        actions = list(dict.fromkeys(game.option_actions(options, player_id)))
+        if len(actions) == 1:
+            return actions[0], np.zeros(33), np.zeros(33, dtype=int), actions
+        
+        if self.book is not None:
+            entry = self.book.lookup(game, player_id)
+            if entry is not None:
+                search_result, search_times = entry
+                return actions[int(np.argmax(search_result[actions]))], search_result, search_times, actions
+        
+        if self.time_manager is not None:
+            search_result, search_times = self.managed_search(game, player_id, actions)
+        else:
+            search_result, search_times = self.search(game, player_id, self.search_time, seed=self.next_seed(game), actions=actions)
+        best = actions[int(np.argmax(search_result[actions]))]
+        return best, search_result, search_times, actions
+    
+    def should_reroll(self, game, player_id, search_result, search_times, actions):
+        """Compare the searched options with the expected best option of a fresh roll."""
+        with profiler.span('search.reroll'):
+            score = game.players[player_id].evaluate(game.cnt, game.net, game.values)
+        current = score[actions]
+        if search_times[actions].all():
+            # Calibrate the network to the searched win rates
+            score = score + np.mean(search_result[actions] - current)
+            current = search_result[actions]
+        return game.reroll_value(score, player_id) > np.max(current) + self.reroll_margin
+    
+    @staticmethod
+    def variance_reduction(sim_points, player_id):
+        """Ratio of independent to paired variance of win rate differences against the best action."""
+        wins = np.array([np.argsort(points, axis=1)[:, -1] == player_id for points in sim_points], dtype=float)
+        if wins.shape[1] < 2:
+            return None
+        best = np.argmax(wins.mean(axis=1))
+        others = np.arange(wins.shape[0]) != best
+        paired = np.var(wins[others] - wins[best], axis=1)
+        independent = np.var(wins[others], axis=1) + np.var(wins[best])
+        if np.sum(paired) == 0:
+            return None
+        return float(np.sum(independent) / np.sum(paired))
+    
+    def judge(self, game, player_id, search_time, seed=None):
+        """Judge current game state, merged with the cached playouts."""
+        if self.cache is None:
+            return self.playout_judge(game, player_id, search_time, seed)
+        
+        players = range(game.player_num)
+        key, slots, wins, counts = self.cache_lookup(game, player_id, 'judge', players)
+        if counts.min() < self.cache.enough:
+            winrate, n = self.playout_judge(game, player_id, search_time, seed)
+            new_wins = np.array(winrate) * n
+            self.cache.add(key, slots, new_wins, [n] * game.player_num)
+            wins, counts = wins + new_wins, counts + n
+        return (wins / np.maximum(counts, 1)).tolist(), int(counts[0])
+    
+    def playout_judge(self, game, player_id, search_time, seed=None):
+        """Judge current game state from new playouts only."""
+        seeds = np.random.SeedSequence(seed)
+        tasks = max(self.processes, 1)
+        sim_game = self.with_models(game)
+        if self.use_shared(sim_game):
+            with profiler.span('judge.pool'):
+                cnt, wins = self.run_shared(sim_game, player_id, search_time, [-1] * tasks, seeds.spawn(tasks),
+                                            max_playouts=self.max_playouts, policy=self.rollout_policy,
+                                            profile=profiler.enabled)
+            return (wins.sum(axis=0) / cnt.sum()).tolist(), int(cnt.sum())
+        
+        with profiler.span('judge.pool'):
+            func = partial(Searcher.simulate, sim_game, player_id, search_time, max_playouts=self.max_playouts,
+                           policy=self.rollout_policy, profile=profiler.enabled)
+            result = self.run(func, list(zip([-1] * tasks, seeds.spawn(tasks))))
+        
+        sim_points, search_times, events = zip(*result)
+        for e in events:
+            profiler.merge(e)
+        sim_points = np.concatenate(sim_points, axis=0)
+        search_times = np.sum(search_times)
+        
+        ranking = np.argsort(sim_points, axis=1)[:, -1]
+        winrate = []
+        for i in range(game.player_num):
+            winrate.append(np.where(ranking == i)[0].shape[0] / ranking.shape[0])
+        
+        return winrate, search_times
+    
+    def network_judge(self, game):
+        """Estimate all players' win rates with one batched forward pass."""
+        with profiler.span('judge.network'):
+            winrate = self.model_player.judge(game.cnt, game.net, game.values)
+        return winrate.tolist(), 0
+    
+    @staticmethod
+    def explore_opponents(game, player_id):
+        """Let every seat but player_id explore in playouts, as the opponents of a search."""
+        for p in game.players:
+            p.random = p.id != player_id
+    
+    def choose(self, game, player_id):
+        """Roll, search only the options on the table and reroll when a fresh roll is expected to be better."""
+        self.explore_opponents(game, player_id)
+        
+        with profiler.span('ai_turn.search'):
+            options = game.roll_dice(player_id)
+            best, search_result, search_times, actions = self.search_options(game, player_id, options)
+            if self.should_reroll(game, player_id, search_result, search_times, actions):
+                options = game.roll_dice(player_id, 1)
+                best, search_result, search_times_reroll, actions = self.search_options(game, player_id, options)
+                search_times = search_times + search_times_reroll
+        self.last_winrate = float(search_result[best]) if len(actions) > 1 else np.nan
+        return best, search_times
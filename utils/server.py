@@ -0,0 +1,347 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
+import struct
+import traceback
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import numpy as np
+from utils.core import GameCore
+from utils.player import Player
+from utils.arena import make_players
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC11B65'
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict',
+          500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def to_json(obj):
+    # numpy values in game state and core events
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+
+class Session:
+    # One game with its own core; operations on a session run one at a time
+
+    def __init__(self, sid, core, autoplay):
+        self.id = sid
+        self.core = core
+        self.autoplay = autoplay  # play AI turns as soon as they come up
+        self.lock = asyncio.Lock()
+        self.listeners = set()  # queues of connected websockets
+
+    def state(self):
+        core, game = self.core, self.core.game
+        return {'id': self.id, 'n_player': game.player_num, 'ai': core.which_ai,
+                'current_player': core.get_current_player(), 'terminal': bool(game.terminal()),
+                'values': game.values, 'net': game.net.astype(int), 'cnt': game.cnt.astype(int),
+                'soldiers': [p.soldiers for p in game.players], 'scores': game.get_current_score(),
+                'options': core.current_options, 'has_rerolled': core.has_rerolled,
+                'winrates': core.current_winrates}
+
+
+class Server:
+    def __init__(self, processes, threads, cache=None):
+        self.processes = processes
+        self.cache = cache  # evaluation cache file shared by all sessions
+        self.pool = mp.Pool(processes=processes) if processes > 0 else None  # shared by every session's search
+        self.executor = ThreadPoolExecutor(max_workers=threads)  # blocking core calls
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.loop = None
+
+    async def blocking(self, func, *args):
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+    # -- sessions
+
+    def create(self, body):
+        n_player = int(body.get('n_player', 3))
+        ai = [int(i) for i in body.get('ai', range(n_player))]
+        players, model_name = make_players(body.get('model', 'best'), int(body.get('stage', 0)), n_player, ai)
+        judge_player = None if ai else Player('agent', players[0].model_config, n_player, 0, model_path=model_name)
+
+        sid = str(next(self.ids))
+        session = Session(sid, GameCore(), bool(body.get('autoplay', False)))
+        for event in GameCore.events:
+            session.core.on(event, self.forward(session, event))
+        session.core.initialize_game(players, body.get('names', [f'Player {i + 1}' for i in range(n_player)]), ai, 1,
+                                     search_time=float(body.get('search_time', 2.0)),
+                                     judge_mode=body.get('judge', 'playout'),
+                                     dice_sampling=body.get('dice', 'independent'), seed=body.get('seed'),
+                                     max_playouts=body.get('playouts'), adaptive_time=bool(body.get('adaptive_time', False)),
+                                     processes=self.processes, judge_player=judge_player, pool=self.pool,
+                                     cache=self.cache)
+        session.core.step_turn()
+        self.sessions[sid] = session
+        return session
+
+    def forward(self, session, event):
+        # core events fire in executor threads, websockets are served by the loop
+        def callback(*args):
+            if event == 'game_state_changed':
+                args = ()
+            message = json.dumps({'event': event, 'args': args}, default=to_json)
+            for queue in list(session.listeners):
+                self.loop.call_soon_threadsafe(queue.put_nowait, message)
+        return callback
+
+    def session(self, sid):
+        if sid not in self.sessions:
+            raise RequestError(404, f'no session {sid}')
+        return self.sessions[sid]
+
+    # -- operations, shared by HTTP and websocket
+
+    async def operate(self, session, op, body):
+        async with session.lock:
+            result = await self.blocking(self.apply, session, op, body)
+            if result is None:
+                # moves answer with the state after any AI turns they lead to
+                if session.autoplay:
+                    await self.blocking(self.autoplay, session)
+                result = session.state()
+        return result
+
+    @staticmethod
+    async def read(session):
+        # state between operations, never a board an executor thread is changing
+        async with session.lock:
+            return session.state()
+
+    def apply(self, session, op, body):
+        core = session.core
+        player_id = core.get_current_player()
+        if op == 'state':
+            return session.state()
+        if op == 'judge':
+            core.update_winrates(player_id)
+            return {'winrates': core.current_winrates}
+        if core.game.terminal() and op != 'search':
+            raise RequestError(409, 'game is over')
+        if op == 'search':
+            return self.search(core, player_id, body)
+        if op == 'ai':
+            if not core.is_ai_player(player_id):
+                raise RequestError(409, f'player {player_id} is not an AI')
+            core.take_ai_action(player_id)
+            core.step_turn()
+        elif op == 'roll':
+            self.require_human(core, player_id)
+            if core.current_options is not None:
+                raise RequestError(409, 'already rolled, use reroll')
+            core.roll_dice_for_player(player_id)
+        elif op == 'reroll':
+            self.require_human(core, player_id)
+            if not core.reroll_dice_for_player(player_id):
+                raise RequestError(409, 'reroll already used this turn')
+        elif op == 'move':
+            self.require_human(core, player_id)
+            if core.current_options is None:
+                raise RequestError(409, 'roll before moving')
+            if not core.take_manual_action(player_id, int(body.get('option', -1))):
+                raise RequestError(400, 'option must be 0, 1 or 2')
+            core.step_turn()
+        else:
+            raise RequestError(404, f'unknown operation {op}')
+
+    @staticmethod
+    def require_human(core, player_id):
+        if core.is_ai_player(player_id):
+            raise RequestError(409, f'player {player_id} is an AI, use ai')
+
+    @staticmethod
+    def search(core, player_id, body):
+        # win rates of the rolled options, or of all 33 actions before a roll
+        searcher = core.searcher
+        actions = body.get('actions')
+        if actions is None and core.current_options is not None:
+            actions = list(dict.fromkeys(core.game.option_actions(core.current_options, player_id)))
+        search_time = float(body.get('search_time', searcher.search_time))
+        res, n = searcher.search(core.game, player_id, search_time, seed=searcher.next_seed(core.game), actions=actions)
+        return {'player': player_id, 'winrates': res, 'playouts': n}
+
+    @staticmethod
+    def autoplay(session):
+        core = session.core
+        while not core.game.terminal() and core.is_ai_player(core.get_current_player()):
+            core.take_ai_action(core.get_current_player())
+            core.step_turn()
+
+    # -- HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            if not request:
+                return
+            method, target, _ = request.decode().split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                key, value = line.split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            path = [p for p in urlsplit(target).path.split('/') if p]
+            if headers.get('upgrade', '').lower() == 'websocket':
+                await self.websocket(reader, writer, headers, path)
+                return
+            try:
+                status, result = 200, await self.route(method, path, json.loads(body) if body else {})
+            except RequestError as e:
+                status, result = e.status, {'error': str(e)}
+            except (ValueError, KeyError, TypeError) as e:
+                status, result = 400, {'error': str(e)}
+            except Exception as e:
+                traceback.print_exc()
+                status, result = 500, {'error': f'{type(e).__name__}: {e}'}
+            payload = json.dumps(result, default=to_json).encode()
+            writer.write(f'HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: application/json\r\n'
+                         f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode() + payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        # /sessions, /sessions/<id> and /sessions/<id>/<op>
+        if not path or path[0] != 'sessions':
+            raise RequestError(404, 'unknown path')
+        if len(path) == 1:
+            if method == 'GET':
+                return [await self.read(s) for s in list(self.sessions.values())]
+            if method == 'POST':
+                session = await self.blocking(self.create, body)
+                if session.autoplay:
+                    async with session.lock:
+                        await self.blocking(self.autoplay, session)
+                return await self.read(session)
+            raise RequestError(405, method)
+        session = self.session(path[1])
+        if len(path) == 2:
+            if method == 'GET':
+                return await self.read(session)
+            if method == 'DELETE':
+                del self.sessions[session.id]
+                return {'deleted': session.id}
+            raise RequestError(405, method)
+        if method != 'POST' and path[2] != 'state':
+            raise RequestError(405, method)
+        return await self.operate(session, path[2], body)
+
+    # -- websocket: /sessions/<id>/ws streams core events and takes {"op": ..., ...} messages
+
+    async def websocket(self, reader, writer, headers, path):
+        if len(path) != 3 or path[2] != 'ws' or path[1] not in self.sessions:
+            writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n')
+            return
+        key = headers.get('sec-websocket-key')
+        if not key:
+            writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            return
+        session = self.sessions[path[1]]
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode())
+        queue = asyncio.Queue()
+        session.listeners.add(queue)
+        sender = asyncio.create_task(self.ws_send_loop(writer, queue))
+        try:
+            while True:
+                opcode, data = await self.ws_read(reader)
+                if opcode == 8:
+                    break
+                if opcode == 9:
+                    self.ws_write(writer, data, opcode=10)
+                    continue
+                if opcode != 1:
+                    continue
+                try:
+                    message = json.loads(data)
+                    result = {'op': message.get('op'), 'result': await self.operate(session, message.get('op'), message)}
+                except RequestError as e:
+                    result = {'op': message.get('op'), 'error': str(e), 'status': e.status}
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    result = {'error': str(e), 'status': 400}
+                except Exception as e:
+                    traceback.print_exc()
+                    result = {'error': f'{type(e).__name__}: {e}', 'status': 500}
+                queue.put_nowait(json.dumps(result, default=to_json))
+        finally:
+            session.listeners.discard(queue)
+            sender.cancel()
+
+    async def ws_send_loop(self, writer, queue):
+        while True:
+            self.ws_write(writer, (await queue.get()).encode())
+            await writer.drain()
+
+    @staticmethod
+    async def ws_read(reader):
+        head = await reader.readexactly(2)
+        opcode, length = head[0] & 0x0f, head[1] & 0x7f
+        if length == 126:
+            length = struct.unpack('>H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', await reader.readexactly(8))[0]
+        mask = await reader.readexactly(4) if head[1] & 0x80 else b'\0\0\0\0'
+        data = bytearray(await reader.readexactly(length))
+        for i in range(length):
+            data[i] ^= mask[i % 4]
+        return opcode, bytes(data)
+
+    @staticmethod
+    def ws_write(writer, data, opcode=1):
+        n = len(data)
+        if n < 126:
+            head = struct.pack('>BB', 0x80 | opcode, n)
+        elif n < 1 << 16:
+            head = struct.pack('>BBH', 0x80 | opcode, 126, n)
+        else:
+            head = struct.pack('>BBQ', 0x80 | opcode, 127, n)
+        writer.write(head + data)
+
+    async def serve(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f'Serving on http://{host}:{port} with {self.processes} search processes')
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--cache', type=str, default=None, help='evaluation cache file shared by all sessions')
+    args = parser.parse_args()
+
+    mp.set_start_method('spawn', force=True)
+    server = Server(args.processes, args.threads, args.cache)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.pool is not None:
+            server.pool.terminate()
@@ -0,0 +1,101 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+# A board in shared memory is one float64 vector:
+# cnt (11 * P), values (11), net (11 * 11), soldiers (P), power_level (P), moves (P), remain_player (1)
+# Each search task writes one result row: playouts, wins per player (P), score sums per player (P)
+
+
+def state_size(n_players):
+    return 11 * n_players + 11 + 121 + 3 * n_players + 1
+
+
+def write_state(game, buf):
+    buf[:] = np.concatenate([game.cnt.reshape(-1), game.values, game.net.reshape(-1),
+                             [p.soldiers for p in game.players], game.power_level, game.moves, [game.remain_player]])
+
+
+def read_state(game, buf):
+    n = game.player_num
+    i = 11 * n
+    game.cnt = buf[:i].reshape(11, n).copy()
+    game.values = buf[i:i + 11].astype(int)
+    game.v2p = {v - 2: k for k, v in enumerate(game.values)}
+    game.net = buf[i + 11:i + 132].reshape(11, 11).copy()
+    i += 132
+    for p, soldiers in zip(game.players, buf[i:i + n]):
+        p.soldiers = int(soldiers)
+        p.static = None
+    game.power_level = buf[i + n:i + 2 * n].copy()
+    game.moves = buf[i + 2 * n:i + 3 * n].astype(int)
+    game.remain_player = int(buf[-1])
+    game.dice_seq = None
+
+
+def shareable(game):
+    # workers rebuild the players from checkpoint paths, untrained networks can't be rebuilt
+    return all(p.model is not None and p.model_path is not None for p in game.players)
+
+
+def game_spec(game):
+    return (game.dice, tuple((p.model_path, tuple(p.model_config.items()), p.epsilon, p.random) for p in game.players))
+
+
+_templates = {}
+
+
+def template(spec):
+    # one game per player setup in each worker, its board is overwritten for every task
+    if spec not in _templates:
+        from utils.player import Player
+        from utils.game import Game
+        dice, specs = spec
+        players = []
+        for i, (model_path, config, epsilon, random) in enumerate(specs):
+            player = Player('agent', dict(config), len(specs), i, model_path=model_path)
+            player.epsilon = epsilon
+            player.random = random
+            players.append(player)
+        _templates[spec] = Game(players, dice=dice)
+    return _templates[spec]
+
+
+class SharedBoard:
+    # board and result rows of one search, shared with the pool workers by name
+
+    def __init__(self, game, n_tasks):
+        n = game.player_num
+        self.spec = game_spec(game)
+        self.state = shared_memory.SharedMemory(create=True, size=state_size(n) * 8)
+        self.result = shared_memory.SharedMemory(create=True, size=n_tasks * (1 + 2 * n) * 8)
+        write_state(game, np.ndarray(state_size(n), dtype=np.float64, buffer=self.state.buf))
+        self.results = np.ndarray((n_tasks, 1 + 2 * n), dtype=np.float64, buffer=self.result.buf)
+        self.results[:] = 0
+        self.names = (self.state.name, self.result.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.results = None  # release the view before closing
+        for shm in [self.state, self.result]:
+            shm.close()
+            shm.unlink()
+
+
+def load_board(spec, state_name):
+    game = template(spec)
+    shm = shared_memory.SharedMemory(name=state_name)
+    read_state(game, np.ndarray(state_size(game.player_num), dtype=np.float64, buffer=shm.buf))
+    shm.close()
+    return game
+
+
+def write_result(result_name, task, n_players, points):
+    shm = shared_memory.SharedMemory(name=result_name)
+    rows = np.ndarray((task + 1, 1 + 2 * n_players), dtype=np.float64, buffer=shm.buf)
+    winners = np.argsort(points, axis=1)[:, -1]
+    rows[task] = np.concatenate([[len(points)], np.bincount(winners, minlength=n_players), points.sum(axis=0)])
+    del rows
+    shm.close()
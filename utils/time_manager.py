@@ -0,0 +1,70 @@
+import math
+import numpy as np
+
+
+class TimeManager:
+    def __init__(self, move_time, n_players, min_time=0.5, rounds=4, z=2.0, tie=0.02, min_samples=8):
+        self.move_time = move_time
+        self.n_players = n_players
+        self.min_time = min_time
+        self.rounds = rounds
+        self.z = z
+        self.tie = tie
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self):
+        # about 9 moves per player: each move deploys 2 soldiers on average
+        self.budget = np.full(self.n_players, self.move_time * 9.0)
+        self.playouts = np.zeros(self.n_players)
+        self.elapsed = np.zeros(self.n_players)
+
+    def expected_moves(self, soldiers):
+        return max(math.ceil(soldiers / 2), 1)
+
+    def allocate(self, game, player_id):
+        soldiers = game.players[player_id].soldiers
+        if soldiers <= 1:
+            return self.min_time
+
+        # deployments matter most mid-game, once the board is contested
+        deployed = 1 - sum(p.soldiers for p in game.players) / (18 * game.player_num)
+        weight = 0.5 + math.sin(math.pi * deployed)
+        share = self.budget[player_id] / self.expected_moves(soldiers) * weight
+        return float(np.clip(share, self.min_time, max(self.budget[player_id], self.min_time)))
+
+    def playout_rate(self, player_id):
+        # playouts per second for each candidate action
+        if self.elapsed[player_id] == 0:
+            return None
+        return self.playouts[player_id] / self.elapsed[player_id]
+
+    def slice_time(self, player_id, budget, waves):
+        # time per search task so that one round gives every action a few playouts
+        slice_time = budget / (self.rounds * waves)
+        rate = self.playout_rate(player_id)
+        if rate:
+            slice_time = max(slice_time, self.min_samples / rate / waves)
+        return min(slice_time, budget / waves)
+
+    def is_clear(self, winrate, counts, candidates=None):
+        if candidates is not None:
+            winrate, counts = winrate[candidates], counts[candidates]
+        if len(winrate) < 2:
+            return True
+        if np.min(counts) < 2:
+            return False
+
+        order = np.argsort(winrate)[::-1]
+        best, second = order[0], order[1]
+        p = np.clip(winrate[[best, second]], 0.05, 0.95)
+        stderr = math.sqrt(np.sum(p * (1 - p) / counts[[best, second]]))
+        gap = winrate[best] - winrate[second]
+
+        # the leader is significantly ahead, or the top two are confidently tied
+        return gap > self.z * stderr or self.z * stderr < self.tie
+
+    def spend(self, player_id, elapsed, playouts, n_actions):
+        self.budget[player_id] = max(self.budget[player_id] - elapsed, 0)
+        self.elapsed[player_id] += elapsed
+        self.playouts[player_id] += playouts / n_actions